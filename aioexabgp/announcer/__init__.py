@@ -3,8 +3,8 @@
 
 import asyncio
 import logging
+import sys
 from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
-from functools import partial
 from ipaddress import (
     ip_address,
     ip_network,
@@ -13,21 +13,54 @@ from ipaddress import (
     IPv6Address,
     IPv6Network,
 )
-from json import JSONDecodeError, loads
+from json import JSONDecodeError
 from sys import stdin
 from time import time
-from typing import Awaitable, Dict, List, Optional, Sequence, Set, TextIO, Union
+from typing import (
+    Any,
+    Callable,
+    Coroutine,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    TextIO,
+    Tuple,
+    Union,
+)
+
+try:
+    # orjson.JSONDecodeError subclasses json.JSONDecodeError
+    from orjson import loads
+except ImportError:  # pragma: no cover
+    from json import loads  # type: ignore
 
 from aioexabgp.exabgpparser import ExaBGPParser
+from aioexabgp.utils import PrefixTrie
 from .fibs import FibOperation, FibPrefix, prefix_consumer
 from .healthcheck import HealthChecker
 
+DEFAULT_PREFIXES = frozenset((ip_network("0.0.0.0/0"), ip_network("::/0")))
 IPNetwork = Union[IPv4Network, IPv6Network]
 IPAddress = Union[IPv4Address, IPv6Address]
 LOG = logging.getLogger(__name__)
 
 
+def _print_line(output: str) -> None:
+    """print() does separate writes for output and the newline. Do one write
+    so concurrent executor threads can't interleave within a line"""
+    sys.stdout.write(f"{output}\n")
+    sys.stdout.flush()
+
+
 class Announcer:
+    INTERNAL_NETWORK_CACHE_SIZE = 65536
+    LEARN_QUEUE_MAX = 10000
+    MAX_CONCURRENT_CHECKS = 64
+    # Max bytes of one exabgp JSON line - Large updates can be many MBs
+    READ_LIMIT = 2**24
+
     def __init__(
         self,
         config: Dict,
@@ -41,26 +74,58 @@ class Announcer:
         self.config = config
         self.dry_run = dry_run
         self.learn_fibs = config["learn"].get("fibs", [])
-        self.learn_queue: asyncio.Queue = asyncio.Queue()
+        # Bounded so a slow FIB makes learn() stop reading STDIN (back pressure)
+        # rather than us buffering updates without limit
+        self.learn_queue: asyncio.Queue = asyncio.Queue(
+            maxsize=config["learn"].get("queue_max", self.LEARN_QUEUE_MAX)
+        )
         self.loop = asyncio.get_event_loop()
+        # Stop large prefix lists forking a ping etc. per check all at once
+        self._check_semaphore = asyncio.Semaphore(
+            config["advertise"].get("max_concurrent_checks", self.MAX_CONCURRENT_CHECKS)
+        )
         self.next_hop = self.validate_next_hop(
             config["advertise"].get("next_hop", "self")
         )
+        self._next_hop_suffix = f" next-hop {self.next_hop}"
         self.print_timeout = print_timeout
+        self._stdin_reader: Optional[asyncio.StreamReader] = None
 
         self.executor = executor
         if not executor:
+            # STDIN is read on the loop so we only need a thread to write STDOUT
+            # - One writer keeps our commands to exabgp in order without locking
             self.executor = ThreadPoolExecutor(
-                max_workers=8, thread_name_prefix="AnnouncerDefault"
+                max_workers=1, thread_name_prefix="AnnouncerStdout"
             )
 
         # State table to add all healthy prefixes in so
         # we know what to reannounce # when a new peer is established
         self.healthy_prefixes: Set[IPNetwork] = set()
 
-        # Lock to ensure we're only printing one command at a time
-        # GIL will prob ensure this, but lets explicitly lock
-        self.print_lock = asyncio.Lock()
+    @property
+    def advertise_prefixes(self) -> Dict[IPNetwork, List[HealthChecker]]:
+        return self._advertise_prefixes
+
+    @advertise_prefixes.setter
+    def advertise_prefixes(
+        self, advertise_prefixes: Dict[IPNetwork, List[HealthChecker]]
+    ) -> None:
+        """Rebuild the state derived from our advertise prefixes on change
+        - Mutating the dict in place will not refresh this state"""
+        self._advertise_prefixes = advertise_prefixes
+        self._advertise_trie = PrefixTrie(advertise_prefixes.keys())
+        self._internal_network_cache: Dict[IPNetwork, bool] = {}
+        self._route_command_cache: Dict[IPNetwork, Tuple[str, str]] = {}
+
+        # Flat (SoA) view of all healthchecks so advertise() can schedule them
+        # in one pass then slice each prefix's results back out
+        self._healthchecks: List[Callable[[], Coroutine[Any, Any, bool]]] = []
+        self._prefix_slices: List[Tuple[IPNetwork, slice]] = []
+        for prefix, checks in advertise_prefixes.items():
+            start = len(self._healthchecks)
+            self._healthchecks.extend(check.cached_check for check in checks)
+            self._prefix_slices.append((prefix, slice(start, len(self._healthchecks))))
 
     # TODO: Test to see if we still need this
     def _cleanup_executor(self, wait: bool = False) -> None:
@@ -80,27 +145,58 @@ class Announcer:
         self.executor.shutdown(wait=wait)
 
     async def nonblock_print(self, output: str) -> bool:
-        """Lock for one print @ a time + wrap print so we
-        don't block and can timeout"""
+        """Wrap print so we don't block and can timeout"""
         try:
-            async with self.print_lock:
-                LOG.debug(f"Attempting to print '{output}' to STDOUT")
-                await asyncio.wait_for(
-                    self.loop.run_in_executor(
-                        self.executor, partial(print, output, flush=True)
-                    ),
-                    self.print_timeout,
-                )
+            LOG.debug("Attempting to print '%s' to STDOUT", output)
+            await asyncio.wait_for(
+                self.loop.run_in_executor(self.executor, _print_line, output),
+                self.print_timeout,
+            )
         except asyncio.TimeoutError:
             LOG.error(f"Timeout: Unable to print '{output}'")
             return False
         return True
 
     async def nonblock_read(self, input: TextIO = stdin) -> str:
-        """Wrap stdin.read() so we can wait for input non-blocking other coroutines"""
-        stdin_line = await self.loop.run_in_executor(self.executor, input.readline)
+        """Read a line from input (a pipe) via the event loop so we don't block
+        other coroutines or need an executor thread
+        - input is attached on first call and used for all subsequent reads
+        - Returns an empty string at EOF"""
+        return (await self.nonblock_read_bytes(input)).decode("utf-8")
+
+    async def nonblock_read_bytes(self, input: TextIO = stdin) -> bytes:
+        """nonblock_read() without decoding - JSON decoders take bytes so
+        this saves copying large updates into a str first"""
+        reader = await self._attach_stdin(input)
+        stdin_line = await reader.readline()
         return stdin_line.strip()
 
+    async def _attach_stdin(
+        self, input: Optional[TextIO] = None
+    ) -> asyncio.StreamReader:
+        """Attach input (default stdin) to the loop once for all reads
+        Throws: ValueError if input is not a pipe/socket (e.g. a regular file)"""
+        if not self._stdin_reader:
+            reader = asyncio.StreamReader(limit=self.READ_LIMIT)
+            await self.loop.connect_read_pipe(
+                lambda: asyncio.StreamReaderProtocol(reader), input or stdin
+            )
+            self._stdin_reader = reader
+        return self._stdin_reader
+
+    def _is_internal_network(self, prefix: IPNetwork) -> bool:
+        """Memoized check if prefix is, or overlaps, a summary we advertise"""
+        cache = self._internal_network_cache
+        if prefix in cache:
+            return cache[prefix]
+
+        is_internal = self._advertise_trie.overlaps(prefix)
+        if len(cache) >= self.INTERNAL_NETWORK_CACHE_SIZE:
+            # Evict the oldest entry
+            del cache[next(iter(cache))]
+        cache[prefix] = is_internal
+        return is_internal
+
     def remove_internal_networks(
         self, bgp_prefixes: List[FibPrefix]
     ) -> List[FibPrefix]:
@@ -108,70 +204,76 @@ class Announcer:
         If so remove it from being internally advertised to our FIBs"""
         if not bgp_prefixes:
             return bgp_prefixes
+        # Learn only - Nothing we advertise can overlap so just dedupe
+        if not self._advertise_trie:
+            return list(dict.fromkeys(bgp_prefixes))
 
-        current_advertise_networks = set(self.advertise_prefixes.keys())
-        default_prefixes = {ip_network("0.0.0.0/0"), ip_network("::/0")}
-        valid_redist_networks: Dict[int, Set[FibPrefix]] = {4: set(), 6: set()}
+        # Programming FIBs needs no sorting - So dedupe keeping exabgp's order
+        valid_redist_networks: Dict[FibPrefix, None] = {}
 
         allow_default = self.config["learn"].get("allow_default", False)
+        is_internal_network = self._is_internal_network
         for aprefix in bgp_prefixes:
-            if allow_default and aprefix.prefix in default_prefixes:
-                valid_redist_networks[aprefix.prefix.version].add(aprefix)
-                continue
-
-            if aprefix.prefix in current_advertise_networks:
+            prefix = aprefix.prefix
+            # Allowed default routes always overlap so skip the internal check
+            if allow_default and prefix in DEFAULT_PREFIXES:
+                pass
+            elif is_internal_network(prefix):
                 LOG.debug(
-                    f"Not advertising {aprefix} to a FIB. "
-                    + "It's a summary we advertise over BGP"
+                    "Not advertising %s to a FIB. "
+                    + "It overlaps a summary we advertise over BGP",
+                    aprefix,
                 )
                 continue
 
-            is_a_subnet = False
-            for advertise_network in current_advertise_networks:
-                if advertise_network.version != aprefix.prefix.version:
-                    continue
-                if advertise_network.overlaps(aprefix.prefix):
-                    LOG.debug(
-                        f"{aprefix} is a subnet of {advertise_network}. "
-                        + "Not advertising to a FIB"
-                    )
-                    is_a_subnet = True
-                    break
-
-            if not is_a_subnet:
-                valid_redist_networks[aprefix.prefix.version].add(aprefix)
+            valid_redist_networks[aprefix] = None
 
-        return sorted(valid_redist_networks[4]) + sorted(valid_redist_networks[6])
+        return list(valid_redist_networks)
 
     def validate_next_hop(self, next_hop: str) -> str:
         """Ensure next hop can ONLY be self of a valid IP Address"""
         if next_hop.lower() == "self":
             return next_hop.lower()
 
-        ip_next_hop = ip_address(next_hop)
-        return str(ip_next_hop.compressed)
+        return ip_address(next_hop).compressed
+
+    def _route_commands(self, prefix: IPNetwork) -> Tuple[str, str]:
+        """Cached (announce, withdraw) ExaBGP commands for prefix
+        - next_hop is fixed so we only need to stringify each prefix once"""
+        commands = self._route_command_cache.get(prefix)
+        if not commands:
+            prefix_str = str(prefix)
+            commands = (
+                f"announce route {prefix_str}{self._next_hop_suffix}",
+                f"withdraw route {prefix_str}{self._next_hop_suffix}",
+            )
+            self._route_command_cache[prefix] = commands
+        return commands
 
     async def add_routes(self, prefixes: Sequence[IPNetwork]) -> int:
-        success = 0
-        for prefix in prefixes:
-            output = f"announce route {prefix} next-hop {self.next_hop}"
-            print_success = await self.nonblock_print(output)
-            if not print_success:
-                continue
+        if not prefixes:
+            return 0
+
+        outputs = [self._route_commands(prefix)[0] for prefix in prefixes]
+        # Send all commands in one write so we only pay one executor hop
+        if not await self.nonblock_print("\n".join(outputs)):
+            return 0
+
+        for prefix, output in zip(prefixes, outputs):
             LOG.info(f"Advertising {prefix} prefix: {output}")
-            success += 1
-        return success
+        return len(outputs)
 
     async def withdraw_routes(self, prefixes: Sequence[IPNetwork]) -> int:
-        success = 0
-        for prefix in prefixes:
-            output = f"withdraw route {prefix} next-hop {self.next_hop}"
-            print_success = await self.nonblock_print(output)
-            if not print_success:
-                continue
+        if not prefixes:
+            return 0
+
+        outputs = [self._route_commands(prefix)[1] for prefix in prefixes]
+        if not await self.nonblock_print("\n".join(outputs)):
+            return 0
+
+        for prefix, output in zip(prefixes, outputs):
             LOG.info(f"Withdrawing {prefix} prefix: {output}")
-            success += 1
-        return success
+        return len(outputs)
 
     async def withdraw_all_routes(self) -> int:
         """Withdraw all routes in self.advertise_prefixes"""
@@ -204,35 +306,54 @@ class Announcer:
             self._cleanup_executor()
             raise
 
+    def _partition_prefixes(
+        self, healthcheck_results: Sequence[Any]
+    ) -> Tuple[List[IPNetwork], List[IPNetwork]]:
+        """Split advertise_prefixes into prefixes to advertise + withdraw
+        - healthcheck_results is in self._healthchecks order
+        - A prefix is only healthy if all its checks returned True"""
+        advertise_routes: List[IPNetwork] = []
+        withdraw_routes: List[IPNetwork] = []
+        for prefix, result_slice in self._prefix_slices:
+            if all(r is True for r in healthcheck_results[result_slice]):
+                advertise_routes.append(prefix)
+            else:
+                withdraw_routes.append(prefix)
+        return advertise_routes, withdraw_routes
+
+    async def _bounded_healthcheck(
+        self, check: Callable[[], Coroutine[Any, Any, bool]], check_timeout: float
+    ) -> bool:
+        # Only time the check itself - Not waiting for our turn to run
+        async with self._check_semaphore:
+            return await asyncio.wait_for(check(), check_timeout)
+
+    async def _run_healthchecks(self, check_timeout: float) -> List[Any]:
+        """Run all healthchecks concurrently (max_concurrent_checks at a time)
+        - A check that raises or takes longer than check_timeout gets the
+          exception as its result"""
+        # Create tasks as we go so early checks start their I/O while
+        # we're still scheduling the rest
+        LOG.debug(f"Scheduling {len(self._healthchecks)} health check(s)")
+        healthcheck_tasks = [
+            self.loop.create_task(self._bounded_healthcheck(check, check_timeout))
+            for check in self._healthchecks
+        ]
+
+        # return_exceptions so one failing check does not cancel the others
+        return await asyncio.gather(*healthcheck_tasks, return_exceptions=True)
+
     async def advertise(self) -> None:
         while True:
             interval = self.config["advertise"]["interval"]
             start_time = time()
 
-            healthcheck_coros: List[Awaitable] = []
-            for prefix, checks in self.advertise_prefixes.items():
-                LOG.debug(f"Scheduling health check(s) for {prefix}")
-                for check in checks:
-                    healthcheck_coros.append(check.check())
-
-            # TODO: Create consumer worker pool
-            healthcheck_results = await asyncio.gather(*healthcheck_coros)
-
-            start_at = 0
-            advertise_routes: List[IPNetwork] = []
-            withdraw_routes: List[IPNetwork] = []
-            for prefix, checks in self.advertise_prefixes.items():
-                end_results = start_at + len(checks)
-                my_results = healthcheck_results[start_at:end_results]
-
-                if map(lambda r: isinstance(r, Exception), my_results) and all(
-                    my_results
-                ):
-                    advertise_routes.append(prefix)
-                else:
-                    withdraw_routes.append(prefix)
-
-                start_at += 1
+            healthcheck_results = await self._run_healthchecks(
+                self.config["advertise"].get("check_timeout", interval)
+            )
+            advertise_routes, withdraw_routes = self._partition_prefixes(
+                healthcheck_results
+            )
 
             if advertise_routes:
                 if not await self.add_routes(advertise_routes):
@@ -267,31 +388,47 @@ class Announcer:
         )
         LOG.debug("Started a FIB operation consumer")
 
+        try:
+            reader = await self._attach_stdin()
+        except ValueError as ve:
+            LOG.error(f"Unable to read API JSON from STDIN. Not learning routes: {ve}")
+            fib_consumer.cancel()
+            return
+
         try:
             while True:
                 LOG.debug("Waiting for API JSON via stdin")
-                bgp_msg = await self.nonblock_read()
+                try:
+                    bgp_msg = (await reader.readline()).strip()
+                except ValueError as ve:
+                    # Lines longer than READ_LIMIT
+                    LOG.error(f"Unable to read API JSON line (skipping): {ve}")
+                    continue
+
+                if not bgp_msg and reader.at_eof():
+                    LOG.error("STDIN has been closed. No longer learning routes")
+                    fib_consumer.cancel()
+                    return
 
                 # TODO: Evaluate if we should care and check if we get a done message
                 # Ignore done from API calls
-                if bgp_msg.strip() == "done":
+                if bgp_msg == b"done":
                     LOG.debug("Recieved a 'done' message from exabgp")
                     continue
 
+                # One JSON document per line - Fast enough to decode in the loop
                 try:
-                    bgp_json = await self.loop.run_in_executor(
-                        self.executor, loads, bgp_msg
-                    )
+                    bgp_json = loads(bgp_msg)
                 except JSONDecodeError as jde:
-                    LOG.error(f"Invalid API JSON (skipping): '{bgp_msg}' ({jde})")
+                    LOG.error(f"Invalid API JSON (skipping): {bgp_msg!r} ({jde})")
                     continue
 
                 # TODO: Work out if this needs to go for close / disconnect messages
                 if "neighbor" not in bgp_json:
-                    LOG.debug(f"Ignoring non neighbor JSON: {bgp_json}")
+                    LOG.debug("Ignoring non neighbor JSON: %s", bgp_json)
                     continue
 
-                fib_operations = await ejp.parse(bgp_json, self.healthy_prefixes)
+                fib_operations = ejp.parse(bgp_json, self.healthy_prefixes)
                 if not fib_operations:
                     LOG.error(
                         f"Didn't parse a valid fib operation from API JSON: {bgp_json}"
@@ -309,11 +446,11 @@ class Announcer:
                     fib_operations = self.remove_internal_networks(fib_operations)
                     if not fib_operations:
                         LOG.debug(
-                            f"Did not get an external prefix from API JSON: {bgp_json}"
+                            "Did not get an external prefix from API JSON: %s", bgp_json
                         )
                         continue
 
-                LOG.debug(f"Adding {fib_operations} to learn_queue")
+                LOG.debug("Adding %s to learn_queue", fib_operations)
                 await self.learn_queue.put(fib_operations)
         except asyncio.CancelledError:
             fib_consumer.cancel()
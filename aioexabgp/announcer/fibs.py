@@ -3,7 +3,9 @@
 import asyncio
 import logging
 import re
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
+from errno import EEXIST
 from ipaddress import (
     ip_address,
     ip_network,
@@ -13,10 +15,16 @@ from ipaddress import (
     IPv6Network,
 )
 from platform import system
+from socket import AF_INET, AF_INET6
 from subprocess import CompletedProcess
 from typing import (
+    Any,
     Awaitable,
+    Callable,
+    cast,
     Dict,
+    Iterable,
+    Iterator,
     List,
     NamedTuple,
     Optional,
@@ -28,6 +36,17 @@ from typing import (
 
 from aioexabgp.utils import run_cmd
 
+try:
+    from pyroute2 import IPRoute
+    from pyroute2.netlink.exceptions import NetlinkError
+except ImportError:  # pragma: no cover
+    IPRoute = None
+
+    class NetlinkError(Exception):  # type: ignore
+        def __init__(self, code: int, msg: str = "") -> None:
+            super().__init__(code, msg)
+            self.code = code
+
 
 IPAddress = Union[IPv4Address, IPv6Address]
 IPNetwork = Union[IPv4Network, IPv6Network]
@@ -45,6 +64,14 @@ class FibOperation(Enum):
     REMOVE_ALL_ROUTES = 3
 
 
+# Operations fib_operation_runner can apply + a description for logging
+ROUTE_OPERATIONS = {
+    FibOperation.ADD_ROUTE: "add",
+    FibOperation.REMOVE_ROUTE: "remove",
+    FibOperation.REMOVE_ALL_ROUTES: "remove all",
+}
+
+
 class FibPrefix(NamedTuple):
     """Immutable object to place on FIB Queue - Then perform operation"""
 
@@ -61,26 +88,38 @@ class Fib:
     - check_for_route()
     - check_prefix_limit()
     - del_route(prefix)
+
+    Optionally override apply_operations() to program many routes at once
     """
 
     DEFAULT_v4_route = ip_network("0.0.0.0/0")
     DEFAULT_v6_route = ip_network("::/0")
-    DEFAULTS = (DEFAULT_v4_route, DEFAULT_v6_route)
+    DEFAULTS = frozenset((DEFAULT_v4_route, DEFAULT_v6_route))
     FIB_NAME = "Default"
     IPV4_LL_PREFIX = ip_network("169.254.0.0/16")
     IPV6_LL_PREFIX = ip_network("fe80::/10")
     LINKLOCALS = {4: IPV4_LL_PREFIX, 6: IPV6_LL_PREFIX}
+    # Integer (first, last) addresses so checks are int compares, not overlaps()
+    LINKLOCAL_RANGES = {
+        version: (int(prefix.network_address), int(prefix.broadcast_address))
+        for version, prefix in LINKLOCALS.items()
+    }
 
     def __init__(self, config: Dict, timeout: float = 2.0) -> None:
         self.default_allowed = config["learn"].get("allow_default", True)
         self.allow_ll_nexthop = config["learn"].get("allow_ll_nexthop", False)
+        self.concurrency = config["learn"].get("fib_concurrency", 16)
         self.prefix_limit = config["learn"].get("prefix_limit", 0)
         self.timeout = timeout
         self.use_sudo = config["learn"].get("use_sudo", True)
 
+    def close(self) -> None:
+        """Release anything the FIB holds open - Called when we stop learning"""
+        pass
+
     def check_prefix_limit(self) -> int:
         if not self.prefix_limit:
-            LOG.debug(f"{self.FIB_NAME} has no prefix limit")
+            LOG.debug("%s has no prefix limit", self.FIB_NAME)
             return 0
 
         raise NotImplementedError(
@@ -88,18 +127,42 @@ class Fib:
             f" ({self.prefix_limit}) set and has no `check_prefix_limit` method"
         )
 
-    def is_default(self, prefix: IPNetwork) -> bool:
-        LOG.debug(f"Checking if {prefix} is a default")
-        return prefix in self.DEFAULTS
+    async def apply_operations(self, fib_operations: Sequence[FibPrefix]) -> List[bool]:
+        """Apply validated fib_operations concurrently
+        - At most self.concurrency at once so a big update can't e.g. fork
+          hundreds of processes at the same time
+        - Returns if each operation succeeded in fib_operations order"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded_route_task(fib_operation: FibPrefix) -> bool:
+            async with semaphore:
+                return await self._route_task(fib_operation)
+
+        return await asyncio.gather(*(bounded_route_task(op) for op in fib_operations))
+
+    async def _batch_operations(
+        self, fib_operations: Sequence[FibPrefix]
+    ) -> Tuple[List[bool], List[Tuple[int, FibPrefix]]]:
+        """For FIBs that program add + remove operations in one go
+        - Returns a result per operation, False if add_route() checks reject it
+        - + (result index, operation) of each route to program"""
+        results: List[bool] = []
+        batch: List[Tuple[int, FibPrefix]] = []
+        for fib_operation in fib_operations:
+            if fib_operation.operation == FibOperation.ADD_ROUTE and not (
+                self._can_add_route(
+                    fib_operation.prefix, cast(IPAddress, fib_operation.next_hop)
+                )
+            ):
+                results.append(False)
+                continue
 
-    def is_link_local(self, prefix: Union[IPAddress, IPNetwork]) -> bool:
-        LOG.debug(f"Checking if {prefix} is link local")
-        if isinstance(prefix, (IPv4Address, IPv6Address)):
-            return prefix in self.LINKLOCALS[prefix.version]
-        return bool(self.LINKLOCALS[prefix.version].overlaps(prefix))
+            batch.append((len(results), fib_operation))
+            results.append(True)
+        return results, batch
 
-    ## To be implemented in child classes + make mypy happy
-    async def add_route(self, prefix: IPNetwork, next_hop: IPAddress) -> bool:
+    def _can_add_route(self, prefix: IPNetwork, next_hop: IPAddress) -> bool:
+        """Config checks for every route add - Shared by add_route() + batches"""
         if not self.default_allowed and self.is_default(prefix):
             LOG.info(
                 f"[{self.FIB_NAME}] Not adding IPv{prefix.version} "
@@ -116,6 +179,36 @@ class Fib:
 
         return True
 
+    def _route_task(self, fib_operation: FibPrefix) -> Awaitable[bool]:
+        if fib_operation.operation == FibOperation.REMOVE_ALL_ROUTES:
+            return self.del_all_routes(fib_operation.next_hop)
+
+        # next_hop is checked by fib_operation_runner for add + remove
+        next_hop = cast(IPAddress, fib_operation.next_hop)
+        if fib_operation.operation == FibOperation.ADD_ROUTE:
+            return self.add_route(fib_operation.prefix, next_hop)
+        return self.del_route(fib_operation.prefix, next_hop)
+
+    def is_default(self, prefix: IPNetwork) -> bool:
+        LOG.debug("Checking if %s is a default", prefix)
+        # Only default routes have a 0 prefix length - Skips hashing the network
+        return prefix is not None and prefix.prefixlen == 0
+
+    def is_link_local(self, prefix: Union[IPAddress, IPNetwork]) -> bool:
+        LOG.debug("Checking if %s is link local", prefix)
+        first, last = self.LINKLOCAL_RANGES[prefix.version]
+        if isinstance(prefix, (IPv4Address, IPv6Address)):
+            return first <= int(prefix) <= last
+        # Overlaps if the network starts before the range ends + ends after it starts
+        return (
+            int(prefix.network_address) <= last
+            and int(prefix.broadcast_address) >= first
+        )
+
+    ## To be implemented in child classes + make mypy happy
+    async def add_route(self, prefix: IPNetwork, next_hop: IPAddress) -> bool:
+        return self._can_add_route(prefix, next_hop)
+
     async def check_for_route(self, prefix: IPNetwork, next_hop: IPAddress) -> bool:
         raise NotImplementedError("Please implement in sub class")
 
@@ -131,10 +224,26 @@ class LinuxFib(Fib):
 
     IP_CMD = "/usr/local/bin/ip" if system() == "Darwin" else "/sbin/ip"
     FIB_NAME = "Linux FIB"
+    # Extra seconds to allow per route in an `ip -batch` run
+    BATCH_ROUTE_TIMEOUT = 0.001
     # Hack to identify routes we add
     METRIC = 31337
     SUDO_CMD = "/usr/sbin/sudo" if system() == "Darwin" else "/usr/bin/sudo"
 
+    def __init__(self, config: Dict, timeout: float = 2.0) -> None:
+        super().__init__(config, timeout)
+        # iproute2mac has no -batch + sudoers may only allow `ip route ...`
+        self.batch_routes = config["learn"].get("batch_routes", system() != "Darwin")
+        self._route_table_fetches: Dict[int, asyncio.Future] = {}
+        # Static parts of every route command - Only the middle changes per route
+        sudo = (self.SUDO_CMD,) if self.use_sudo else ()
+        self._cmd_prefixes = {
+            4: sudo + (self.IP_CMD, "-4"),
+            6: sudo + (self.IP_CMD, "-6"),
+        }
+        self._batch_cmd = [*sudo, self.IP_CMD, "-force", "-batch", "-"]
+        self._metric_suffix = ("metric", str(self.METRIC))
+
     async def add_route(self, prefix: IPNetwork, next_hop: IPAddress) -> bool:
         if not await super().add_route(prefix, next_hop):
             return False
@@ -145,36 +254,139 @@ class LinuxFib(Fib):
         )
         return cp.returncode == 0
 
+    async def apply_operations(self, fib_operations: Sequence[FibPrefix]) -> List[bool]:
+        """Program all route adds + deletes with one `ip -batch` process
+        - Saves a fork + exec (+ sudo) per route on large BGP updates
+        - Route at a time if batch_routes is disabled"""
+        if not self.batch_routes or any(
+            op.operation == FibOperation.REMOVE_ALL_ROUTES for op in fib_operations
+        ):
+            return await super().apply_operations(fib_operations)
+
+        results, batch = await self._batch_operations(fib_operations)
+        if not batch:
+            return results
+
+        batch_lines = [
+            " ".join(
+                self.gen_route_args(
+                    "add" if op.operation == FibOperation.ADD_ROUTE else "delete",
+                    op.prefix,
+                    cast(IPAddress, op.next_hop),
+                )
+            )
+            for _, op in batch
+        ]
+
+        LOG.info(f"[{self.FIB_NAME}] Running {len(batch_lines)} route operations")
+        cp = await run_cmd(
+            self.gen_batch_command(),
+            self.timeout + (len(batch_lines) * self.BATCH_ROUTE_TIMEOUT),
+            input="\n".join(batch_lines) + "\n",
+        )
+        if cp.returncode != 0:
+            # -force keeps ip going after a failure so we can find the failed lines
+            failed_lines = re.findall(r"Command failed -:(\d+)", cp.stderr)
+            if not failed_lines:
+                LOG.error(f"[{self.FIB_NAME}] Batch failed: {cp.stderr.strip()}")
+                retry_results = await self._retry_batch([op for _, op in batch])
+                for (result_idx, _), success in zip(batch, retry_results):
+                    results[result_idx] = success
+            for line_number in failed_lines:
+                failed_line = batch_lines[int(line_number) - 1]
+                LOG.error(f"[{self.FIB_NAME}] Failed: {failed_line}")
+                results[batch[int(line_number) - 1][0]] = False
+        return results
+
+    async def _retry_batch(self, fib_operations: Sequence[FibPrefix]) -> List[bool]:
+        """`ip -batch` stops at a line it can't parse without saying which line
+        - Keep what the kernel shows as done + retry the rest a route at a time"""
+        v4_route_table, v6_route_table = await asyncio.gather(
+            self.get_route_table(4), self.get_route_table(6)
+        )
+        route_tables = {4: v4_route_table, 6: v6_route_table}
+        results: List[bool] = []
+        for op in fib_operations:
+            route_table = route_tables[op.prefix.version]
+            if route_table.returncode != 0:
+                # Can't tell what made it in - Retry it
+                results.append(False)
+                continue
+            in_fib = self._route_in_table(
+                op.prefix, cast(IPAddress, op.next_hop), route_table.stdout
+            )
+            # Adds are done if the route is there, deletes if it's gone
+            results.append(in_fib == (op.operation == FibOperation.ADD_ROUTE))
+
+        retry_idxs = [idx for idx, done in enumerate(results) if not done]
+        retry_results = await super().apply_operations(
+            [fib_operations[idx] for idx in retry_idxs]
+        )
+        for idx, success in zip(retry_idxs, retry_results):
+            results[idx] = success
+        return results
+
+    def gen_batch_command(self) -> List[str]:
+        return list(self._batch_cmd)
+
     async def get_route_table(self, ip_version: int) -> CompletedProcess:
-        return await run_cmd((self.IP_CMD, f"-{ip_version}", "route", "show"))
+        """Concurrent callers share one in flight `ip route show` per version"""
+        fetch = self._route_table_fetches.get(ip_version)
+        if not fetch:
+            fetch = asyncio.ensure_future(
+                run_cmd((self.IP_CMD, f"-{ip_version}", "route", "show"))
+            )
+            self._route_table_fetches[ip_version] = fetch
+            fetch.add_done_callback(
+                lambda _: self._route_table_fetches.pop(ip_version, None)
+            )
+        # Shield so one cancelled caller does not cancel the fetch for everyone
+        return await asyncio.shield(fetch)
 
     async def check_for_route(self, prefix: IPNetwork, next_hop: IPAddress) -> bool:
+        route_table = await self.get_route_table(prefix.version)
+        return self._route_in_table(prefix, next_hop, route_table.stdout)
+
+    def _route_in_table(
+        self, prefix: IPNetwork, next_hop: IPAddress, route_table: str
+    ) -> bool:
+        # `ip route` shows default routes as "default"
+        prefix_regex = "default" if self.is_default(prefix) else prefix.compressed
+        # Anchor to the start of a line + escape the dots so we can't match
+        # other prefixes / next hops containing ours (e.g. 110.0.0.0/24)
         route_regex = (
-            rf"{prefix.compressed} via.*{next_hop.compressed}.*metric {self.METRIC}.*"
+            rf"^{re.escape(prefix_regex)} via (inet6 )?"
+            + rf"{re.escape(next_hop.compressed)} .*metric {self.METRIC}\b"
         )
-        route_table = await self.get_route_table(prefix.version)
-        if re.search(route_regex, route_table.stdout):
-            return True
-        return False
+        return bool(re.search(route_regex, route_table, re.MULTILINE))
 
     async def del_all_routes(self, next_hop: Optional[IPAddress]) -> bool:
         del_route_count = 0
-        v4_route_table = await self.get_route_table(4)
-        v6_route_table = await self.get_route_table(6)
-        remove_regex = (
-            rf"(.*) via.*{next_hop.compressed}.*metric {self.METRIC}.*"
-            if next_hop
-            else rf"(.*) via (.*) dev .*metric {self.METRIC}"
+        v4_route_table, v6_route_table = await asyncio.gather(
+            self.get_route_table(4), self.get_route_table(6)
         )
-        for route_table in v4_route_table, v6_route_table:
+        # Compile once for every line of both tables + only run it on our routes
+        metric = f"metric {self.METRIC}"
+        next_hop_regex = re.escape(next_hop.compressed) if next_hop else r"\S+"
+        remove_regex = re.compile(
+            rf"(\S+) via (?:inet6 )?({next_hop_regex}) .*{metric}\b"
+        )
+        for ip_version, route_table in ((4, v4_route_table), (6, v6_route_table)):
             for line in route_table.stdout.splitlines():
-                if prefix_match := re.match(remove_regex, line):
-                    prefix_network = ip_network(prefix_match.group(1))
-                    del_next_hop = (
-                        next_hop
-                        if next_hop
-                        else ip_address(prefix_match.group(2).replace("inet6 ", ""))
+                if metric not in line:
+                    continue
+                if prefix_match := remove_regex.match(line):
+                    prefix_str, next_hop_str = prefix_match.groups()
+                    prefix_network = (
+                        ip_network(prefix_str)
+                        if prefix_str != "default"
+                        else (
+                            self.DEFAULT_v4_route
+                            if ip_version == 4
+                            else self.DEFAULT_v6_route
+                        )
                     )
+                    del_next_hop = next_hop if next_hop else ip_address(next_hop_str)
                     if not await self.del_route(prefix_network, del_next_hop):
                         LOG.error(
                             f"Failed to delete {prefix_network.compressed} in del_all_routes"
@@ -198,29 +410,181 @@ class LinuxFib(Fib):
         prefix: IPNetwork,
         next_hop: IPAddress,
     ) -> List[str]:
-        cmd = [self.SUDO_CMD] if self.use_sudo else []
-        cmd.extend(
-            [
-                self.IP_CMD,
-                f"-{prefix.version}",
-                "route",
-                op,
-                "default" if self.is_default(prefix) else str(prefix),
-                "via",
-            ]
-        )
+        route_args = self.gen_route_args(op, prefix, next_hop)
+        if prefix.prefixlen == 0:
+            # Replace the prefix
+            route_args[2] = "default"
+        return [*self._cmd_prefixes[prefix.version], *route_args]
+
+    def gen_route_args(
+        self,
+        op: str,
+        prefix: IPNetwork,
+        next_hop: IPAddress,
+    ) -> List[str]:
+        """`ip route` arguments - Also used as lines for `ip -batch`
+        - The prefix is always a CIDR so ip can infer the address family"""
+        args = ["route", op, str(prefix), "via"]
         if prefix.version == 4 and next_hop.version == 6:
-            cmd.append("inet6")
-        cmd.append(str(next_hop))
-        cmd.extend(["metric", str(self.METRIC)])
-        return cmd
+            args.append("inet6")
+        args.append(str(next_hop))
+        args.extend(self._metric_suffix)
+        return args
+
+
+class NetlinkFib(Fib):
+    """Adding and taking routes out of the Linux Routing Table via netlink
+    - Needs pyroute2 + CAP_NET_ADMIN but no fork + exec of `ip` per route"""
+
+    FAMILIES = {4: AF_INET, 6: AF_INET6}
+    FIB_NAME = "Netlink FIB"
+    # Share LinuxFib's metric so either FIB can manage our routes
+    METRIC = LinuxFib.METRIC
+
+    def __init__(self, config: Dict, timeout: float = 2.0) -> None:
+        super().__init__(config, timeout)
+        if IPRoute is None:
+            raise ValueError(f"{self.FIB_NAME} requires pyroute2 to be installed")
+        self.ipr = IPRoute()
+        # IPRoute sockets are not thread safe - Serialize all netlink calls
+        self.executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="NetlinkFib"
+        )
+
+    async def _run(
+        self, func: Callable[..., Any], *args: Any, timeout: Optional[float] = None
+    ) -> Any:
+        return await asyncio.wait_for(
+            asyncio.get_event_loop().run_in_executor(self.executor, func, *args),
+            timeout or self.timeout,
+        )
+
+    async def apply_operations(self, fib_operations: Sequence[FibPrefix]) -> List[bool]:
+        """Send all route adds + deletes from one executor call
+        - One thread hop per update rather than one per route"""
+        if any(op.operation == FibOperation.REMOVE_ALL_ROUTES for op in fib_operations):
+            return await super().apply_operations(fib_operations)
+
+        results, batch = await self._batch_operations(fib_operations)
+        if not batch:
+            return results
+
+        LOG.info(f"[{self.FIB_NAME}] Running {len(batch)} route operations")
+        batch_results = await self._run(
+            self._routes,
+            [op for _, op in batch],
+            timeout=self.timeout + (len(batch) * LinuxFib.BATCH_ROUTE_TIMEOUT),
+        )
+        for (result_idx, _), success in zip(batch, batch_results):
+            results[result_idx] = success
+        return results
+
+    def _routes(self, fib_operations: Sequence[FibPrefix]) -> List[bool]:
+        return [
+            self._route(
+                "add" if op.operation == FibOperation.ADD_ROUTE else "del",
+                op.prefix,
+                cast(IPAddress, op.next_hop),
+            )
+            for op in fib_operations
+        ]
+
+    def _route(self, op: str, prefix: IPNetwork, next_hop: IPAddress) -> bool:
+        route_args: Dict[str, Any] = {
+            "dst": prefix.compressed,
+            "family": self.FAMILIES[prefix.version],
+            "priority": self.METRIC,
+        }
+        if prefix.version == next_hop.version:
+            route_args["gateway"] = next_hop.compressed
+        else:
+            route_args["via"] = {
+                "family": self.FAMILIES[next_hop.version],
+                "addr": next_hop.compressed,
+            }
+
+        try:
+            self.ipr.route(op, **route_args)
+        except NetlinkError as ne:
+            # The same dst + metric via another next hop is also EEXIST
+            if op == "add" and ne.code == EEXIST and self._has_route(prefix, next_hop):
+                LOG.debug("%s via %s already exists", prefix, next_hop)
+                return True
+            LOG.error(f"[{self.FIB_NAME}] {op} {prefix} via {next_hop} failed: {ne}")
+            return False
+        return True
+
+    def _route_gateway(self, route: Any) -> Optional[IPAddress]:
+        gateway = route.get_attr("RTA_GATEWAY")
+        if not gateway and route.get_attr("RTA_VIA"):
+            gateway = route.get_attr("RTA_VIA")["addr"]
+        return ip_address(gateway) if gateway else None
+
+    def _has_route(self, prefix: IPNetwork, next_hop: IPAddress) -> bool:
+        try:
+            routes = self.ipr.get_routes(
+                family=self.FAMILIES[prefix.version],
+                dst=prefix.compressed,
+                priority=self.METRIC,
+            )
+        except NetlinkError as ne:
+            LOG.error(f"[{self.FIB_NAME}] Unable to lookup {prefix}: {ne}")
+            return False
+        return any(self._route_gateway(route) == next_hop for route in routes)
+
+    def _dump_routes(self) -> List[Tuple[IPNetwork, IPAddress]]:
+        """Return (prefix, next_hop) of every route we own in both families"""
+        routes: List[Tuple[IPNetwork, IPAddress]] = []
+        for version, family in self.FAMILIES.items():
+            for route in self.ipr.get_routes(family=family, priority=self.METRIC):
+                dst = route.get_attr("RTA_DST")
+                prefix: IPNetwork
+                if dst:
+                    prefix = ip_network(f"{dst}/{route['dst_len']}")
+                else:
+                    prefix = (
+                        self.DEFAULT_v4_route if version == 4 else self.DEFAULT_v6_route
+                    )
+                gateway = self._route_gateway(route)
+                if gateway:
+                    routes.append((prefix, gateway))
+        return routes
+
+    async def add_route(self, prefix: IPNetwork, next_hop: IPAddress) -> bool:
+        if not await super().add_route(prefix, next_hop):
+            return False
+
+        LOG.info(f"[{self.FIB_NAME}] Adding route to {prefix} via {next_hop}")
+        return bool(await self._run(self._route, "add", prefix, next_hop))
+
+    async def check_for_route(self, prefix: IPNetwork, next_hop: IPAddress) -> bool:
+        return (prefix, next_hop) in await self._run(self._dump_routes)
+
+    async def del_all_routes(self, next_hop: Optional[IPAddress]) -> bool:
+        del_route_count = 0
+        for prefix, route_next_hop in await self._run(self._dump_routes):
+            if next_hop and route_next_hop != next_hop:
+                continue
+            if await self.del_route(prefix, route_next_hop):
+                del_route_count += 1
+            else:
+                LOG.error(f"Failed to delete {prefix.compressed} in del_all_routes")
+        LOG.info(f"del_all_routes deleted {del_route_count} routes")
+        return bool(del_route_count)
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False)
+        self.ipr.close()
+
+    async def del_route(self, prefix: IPNetwork, next_hop: IPAddress) -> bool:
+        LOG.info(f"[{self.FIB_NAME}] Deleting route to {prefix}")
+        return bool(await self._run(self._route, "del", prefix, next_hop))
 
 
 def _update_learnt_routes(  # noqa: C901
     fib_operations: Sequence[FibPrefix],
 ) -> Tuple[int, int]:
     """Take fib operations and keep BGP_LEARNT_PREFIXES in sync"""
-    global BGP_LEARNT_PREFIXES
     add_count = 0
     del_count = 0
 
@@ -228,14 +592,15 @@ def _update_learnt_routes(  # noqa: C901
         "[update_learnt_routes] Attempting to update BGP Learnt Prefixes dictionary"
     )
     for fib_op in fib_operations:
+        # One dict lookup per operation - The set is then updated in place
+        learnt_next_hops = BGP_LEARNT_PREFIXES.get(fib_op.prefix)
         if fib_op.operation == FibOperation.ADD_ROUTE:
-            if fib_op.prefix not in BGP_LEARNT_PREFIXES:
-                if fib_op.next_hop:
-                    BGP_LEARNT_PREFIXES[fib_op.prefix] = {fib_op.next_hop}
-                else:
-                    BGP_LEARNT_PREFIXES[fib_op.prefix] = set()
+            if learnt_next_hops is None:
+                BGP_LEARNT_PREFIXES[fib_op.prefix] = (
+                    {fib_op.next_hop} if fib_op.next_hop else set()
+                )
             elif fib_op.next_hop:
-                BGP_LEARNT_PREFIXES[fib_op.prefix].add(fib_op.next_hop)
+                learnt_next_hops.add(fib_op.next_hop)
             else:
                 LOG.error(
                     "[update_learnt_routes] Got a learnt route with no nethop:"
@@ -244,7 +609,7 @@ def _update_learnt_routes(  # noqa: C901
                 continue
             add_count += 1
         elif fib_op.operation == FibOperation.REMOVE_ROUTE:
-            if fib_op.prefix not in BGP_LEARNT_PREFIXES:
+            if learnt_next_hops is None:
                 LOG.error(
                     f"[update_learnt_routes] {fib_op.prefix} not foud in BGP Learnt "
                     + "Prefixes - Not deleted"
@@ -252,11 +617,11 @@ def _update_learnt_routes(  # noqa: C901
                 continue
 
             del_ops = 0
-            if fib_op.next_hop in BGP_LEARNT_PREFIXES[fib_op.prefix]:
-                BGP_LEARNT_PREFIXES[fib_op.prefix].remove(fib_op.next_hop)
+            if fib_op.next_hop in learnt_next_hops:
+                learnt_next_hops.remove(fib_op.next_hop)
                 del_ops += 1
 
-            if not BGP_LEARNT_PREFIXES[fib_op.prefix]:
+            if not learnt_next_hops:
                 del BGP_LEARNT_PREFIXES[fib_op.prefix]
                 del_ops += 1
 
@@ -266,9 +631,8 @@ def _update_learnt_routes(  # noqa: C901
                 LOG.error(f"[update_learnt_routes] No deletion took place for {fib_op}")
         elif fib_op.operation == FibOperation.REMOVE_ALL_ROUTES:
             del_count = del_count + len(BGP_LEARNT_PREFIXES)
-            # Had to make copy of keys and delete prefixes 1 by 1 for unittests to pass
-            for key in list(BGP_LEARNT_PREFIXES.keys()):
-                del BGP_LEARNT_PREFIXES[key]
+            # Clear in place as other modules hold a reference to the dict
+            BGP_LEARNT_PREFIXES.clear()
             LOG.info(
                 "[update_learnt_routes] Resettting BGP Learnt Prefixes due to "
                 + "REMOVE_ALL_ROUTES being received"
@@ -280,9 +644,68 @@ def _update_learnt_routes(  # noqa: C901
     return (add_count, del_count)
 
 
+def _coalesce_fib_operations(fib_operations: Iterable[FibPrefix]) -> List[FibPrefix]:
+    """Only keep the latest operation for each prefix + next-hop
+    - Drop operations that would not change BGP_LEARNT_PREFIXES
+      e.g. a route that was withdrawn and announced again"""
+    latest: Dict[Tuple[IPNetwork, Optional[IPAddress]], FibPrefix] = {}
+    added: Set[Tuple[IPNetwork, Optional[IPAddress]]] = set()
+    for fib_op in fib_operations:
+        key = (fib_op.prefix, fib_op.next_hop)
+        if fib_op.operation == FibOperation.ADD_ROUTE:
+            added.add(key)
+        # Move key to the end so operations stay in the order they last arrived
+        latest.pop(key, None)
+        latest[key] = fib_op
+
+    coalesced_operations: List[FibPrefix] = []
+    for key, fib_op in latest.items():
+        learnt = key[1] in BGP_LEARNT_PREFIXES.get(key[0], ())
+        if fib_op.operation == FibOperation.ADD_ROUTE and learnt:
+            continue
+        # Only skip removes we added + removed, the route may predate us
+        if (
+            fib_op.operation == FibOperation.REMOVE_ROUTE
+            and not learnt
+            and key in added
+        ):
+            continue
+        coalesced_operations.append(fib_op)
+    return coalesced_operations
+
+
+def _coalesce_fib_batches(
+    fib_batches: Sequence[Sequence[FibPrefix]],
+) -> Iterator[List[FibPrefix]]:
+    """Merge queued batches into as few FIB updates as possible
+    - REMOVE_ALL_ROUTES batches run on their own + in order
+    - Updates that coalesce to no operations are skipped
+    - Lazy so BGP_LEARNT_PREFIXES is current when each update is coalesced"""
+    pending: List[FibPrefix] = []
+    for fib_operations in fib_batches:
+        if any(op.operation == FibOperation.REMOVE_ALL_ROUTES for op in fib_operations):
+            yield from _coalesce_pending(pending)
+            pending = []
+            yield list(fib_operations)
+            continue
+        pending.extend(fib_operations)
+
+    yield from _coalesce_pending(pending)
+
+
+def _coalesce_pending(fib_operations: List[FibPrefix]) -> Iterator[List[FibPrefix]]:
+    coalesced_operations = _coalesce_fib_operations(fib_operations)
+    if coalesced_operations:
+        yield coalesced_operations
+    elif fib_operations:
+        LOG.debug("%d FIB operations coalesced to nothing", len(fib_operations))
+
+
 def get_fib(fib_name: str, config: Dict) -> Fib:
     if fib_name == "Linux":
         return LinuxFib(config)
+    if fib_name == "Netlink":
+        return NetlinkFib(config)
 
     raise ValueError(f"{fib_name} is not a valid option")
 
@@ -298,88 +721,108 @@ async def prefix_consumer(
     fibs = {f: get_fib(f, config) for f in fib_names}
     LOG.debug(f"prefix_consumer got {len(fibs)} FIBS")
 
-    while True:
-        LOG.debug("[prefix_consumer] Waiting for FIB prefix to consume")
-        try:
-            fib_operations = await prefix_queue.get()
-            LOG.info(
-                f"[prefix_consumer] Prefix Queue has {prefix_queue.qsize()} tasks"
-                " queued"
-            )
-            LOG.info(
-                "[prefix_consumer] Running the following fib operations: "
-                + f"{fib_operations}"
-            )
-            await fib_operation_runner(fibs, fib_operations, dry_run)
-        except asyncio.CancelledError:
-            raise
-        except Exception as e:
-            LOG.exception(f"[prefix_consumer] Got a {type(e)} exception")
+    try:
+        while True:
+            LOG.debug("[prefix_consumer] Waiting for FIB prefix to consume")
+            try:
+                fib_batches = [await prefix_queue.get()]
+                # Drain everything else queued so a burst is applied together
+                while True:
+                    try:
+                        fib_batches.append(prefix_queue.get_nowait())
+                    except asyncio.QueueEmpty:
+                        break
+                LOG.debug(
+                    "[prefix_consumer] Consumed %d queued updates", len(fib_batches)
+                )
+                if prefix_queue.maxsize and len(fib_batches) >= prefix_queue.maxsize:
+                    LOG.warning(
+                        "[prefix_consumer] Learn queue was full "
+                        + f"({prefix_queue.maxsize}) - FIBs are falling behind"
+                    )
+
+                for fib_operations in _coalesce_fib_batches(fib_batches):
+                    # Full table updates can hold 100k+ operations so only
+                    # format them all if we're debugging
+                    LOG.info(
+                        f"[prefix_consumer] Running {len(fib_operations)} fib "
+                        + "operations"
+                    )
+                    LOG.debug(
+                        "[prefix_consumer] Running the following fib operations: %s",
+                        fib_operations,
+                    )
+                    await fib_operation_runner(fibs, fib_operations, dry_run)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                LOG.exception(f"[prefix_consumer] Got a {type(e)} exception")
+    finally:
+        # Keep long lived FIB resources (e.g. netlink sockets) for our lifetime
+        for fib in fibs.values():
+            fib.close()
 
 
 async def fib_operation_runner(
     fibs: Dict[str, Fib], fib_operations: Sequence[FibPrefix], dry_run: bool
 ) -> None:
+    """Apply all fib_operations to all FIBs concurrently with one gather
+    - BGP_LEARNT_PREFIXES is only updated for operations all FIBs applied"""
     lprefix = "[fib_operation_runner] "
+    valid_operations: List[FibPrefix] = []
     for fib_operation in fib_operations:
-        route_tasks: List[Awaitable] = []
         if not fib_operation.prefix:
             LOG.error(f"Invalid Fib Operation. Invalid data: {fib_operation}")
             continue
 
-        for fib_name, fib in fibs.items():
-            if fib_operation.operation == FibOperation.ADD_ROUTE:
-                LOG.debug(
-                    f"{lprefix}Adding {fib_operation.prefix} route "
-                    + f"via {fib_operation.next_hop} to {fib_name}"
-                )
-                if not fib_operation.next_hop:
-                    LOG.error(
-                        f"{lprefix}Can't add {fib_operation.prefix} with no next-hop"
-                    )
-                    continue
-                route_tasks.append(
-                    fib.add_route(fib_operation.prefix, fib_operation.next_hop)
-                )
-            elif fib_operation.operation == FibOperation.REMOVE_ROUTE:
-                if not fib_operation.next_hop:
-                    LOG.error(
-                        f"{lprefix}Can't remove {fib_operation.prefix} with no next-hop"
-                    )
-                    continue
-                LOG.debug(
-                    f"{lprefix}Removing {fib_operation.prefix} "
-                    + f"route via {fib_operation.next_hop} from {fib_name}"
-                )
-                route_tasks.append(
-                    fib.del_route(fib_operation.prefix, fib_operation.next_hop)
-                )
-            elif fib_operation.operation == FibOperation.REMOVE_ALL_ROUTES:
-                LOG.debug(
-                    f"{lprefix}Removing ALL routes via "
-                    + f"{fib_operation.next_hop} from {fib_name}"
-                )
-                route_tasks.append(fib.del_all_routes(fib_operation.next_hop))
-            else:
-                LOG.error(f"{lprefix}{fib_operation.operation} operation is unhandled")
-
-        if not route_tasks:
-            LOG.error(f"{lprefix}No route tasks generated for update")
-            continue
-
-        log_msg = (
-            f"{lprefix}Running {len(route_tasks)} "
-            + f"FIB operations for {fib_operation}"
-        )
-        if dry_run:
-            LOG.info(f"{lprefix}[DRY RUN] {log_msg}")
+        if fib_operation.operation not in ROUTE_OPERATIONS:
+            LOG.error(f"{lprefix}{fib_operation.operation} operation is unhandled")
             continue
 
-        LOG.info(log_msg)
-        update_success = await asyncio.gather(*route_tasks)
-        if not all(update_success):
+        if (
+            fib_operation.operation != FibOperation.REMOVE_ALL_ROUTES
+            and not fib_operation.next_hop
+        ):
             LOG.error(
-                f"{lprefix}There was a FIB operation failure. Please investigate!"
+                f"{lprefix}Can't {ROUTE_OPERATIONS[fib_operation.operation]} "
+                + f"{fib_operation.prefix} with no next-hop"
             )
-        else:
-            _update_learnt_routes(fib_operations)
+            continue
+
+        valid_operations.append(fib_operation)
+
+    if not valid_operations or not fibs:
+        LOG.error(f"{lprefix}No route tasks generated for update")
+        return
+
+    log_msg = (
+        f"{lprefix}Running {len(valid_operations) * len(fibs)} "
+        + f"FIB operations for {len(valid_operations)} updates"
+    )
+    if dry_run:
+        LOG.info(f"{lprefix}[DRY RUN] {log_msg}")
+        return
+
+    LOG.info(log_msg)
+    # Each FIB returns a result per operation - Let FIBs batch them how they can
+    # return_exceptions so a broken FIB can't stop the others being programmed
+    gathered_results = await asyncio.gather(
+        *(fib.apply_operations(valid_operations) for fib in fibs.values()),
+        return_exceptions=True,
+    )
+    fib_results: List[List[bool]] = []
+    for fib_name, results in zip(fibs, gathered_results):
+        if isinstance(results, BaseException):
+            LOG.error(f"{lprefix}{fib_name} failed to apply operations: {results}")
+            results = [False] * len(valid_operations)
+        fib_results.append(results)
+    applied_operations = [
+        fib_operation
+        for fib_operation, *update_success in zip(valid_operations, *fib_results)
+        if all(update_success)
+    ]
+    if len(applied_operations) != len(valid_operations):
+        LOG.error(f"{lprefix}There was a FIB operation failure. Please investigate!")
+
+    if applied_operations:
+        _update_learnt_routes(applied_operations)
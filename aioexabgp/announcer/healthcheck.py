@@ -1,25 +1,51 @@
 #!/usr/bin/env python3
 
 import logging
+import os
 from ipaddress import ip_address, ip_network, IPv4Network, IPv6Network
 from platform import system
+from time import monotonic
 from typing import Dict, List, Union
 
 from aioexabgp.utils import run_cmd
 
+try:
+    from icmplib import async_ping, ICMPSocketError
+except ImportError:  # pragma: no cover
+    async_ping = None
+
 
 IPNetwork = Union[IPv4Network, IPv6Network]
 LOG = logging.getLogger(__name__)
 
 
 class HealthChecker:
-    """Base class for defining base Health Check API"""
+    """Base class for defining base Health Check API
+
+    Config Supported:
+    - "cache_ttl": Reuse a check result for this many seconds - Default 0 (off)"""
 
     TIMEOUT_DEFAULT = 5
+    # Class defaults so subclasses not calling super().__init__ can cached_check()
+    cache_ttl = 0
+    _last_check_time = 0.0
+    _last_result = False
 
     def __init__(self, config: Dict) -> None:
         self.config = config
         self.timeout = config.get("timeout", self.TIMEOUT_DEFAULT)
+        self.cache_ttl = config.get("cache_ttl", 0)
+        self._last_check_time = 0.0
+        self._last_result = False
+
+    async def cached_check(self) -> bool:
+        """check() unless we have a result younger than cache_ttl"""
+        if self.cache_ttl and monotonic() - self._last_check_time < self.cache_ttl:
+            return self._last_result
+
+        self._last_result = await self.check()
+        self._last_check_time = monotonic()
+        return self._last_result
 
     async def check(self) -> bool:
         raise NotImplementedError("Implement in subclass")
@@ -29,16 +55,25 @@ class PingChecker(HealthChecker):
     """Send ICMP/ICMPv6 Pings to check reachability
     - Only support IP addresses for now
     - Subprocess so this script + exabgp don't need setuid
+    - If icmplib is installed ping in process via ICMP sockets
+      - Raw sockets when running as root, otherwise unprivileged ICMP sockets
+      - Falls back to the subprocess if the OS does not allow them
 
     Config Supported:
     - "ping_count": Default 2
+    - "ping_icmplib": Default True (if installed)
     - "ping_timeout": Default 5 (seconds)"""
 
     def __init__(self, config: Dict) -> None:
+        super().__init__(config)
         self.target_ip = ip_address(config["ping_target"])
         self.count = config.get("ping_count", 2)
         self.timeout = config.get("ping_timeout", self.TIMEOUT_DEFAULT)
         self.wait = config.get("ping_wait", int(self.timeout) - 1)
+        self.use_icmplib = async_ping is not None and config.get("ping_icmplib", True)
+        self.icmp_privileged = os.geteuid() == 0
+        # Nothing in the ping command changes between checks
+        self.ping_cmd = self.gen_ping_command()
 
     def __str__(self) -> str:
         return (
@@ -46,14 +81,33 @@ class PingChecker(HealthChecker):
             + f" Timeout: {self.timeout}"
         )
 
+    async def do_icmplib_ping(self) -> bool:
+        host = await async_ping(
+            self.target_ip.compressed,
+            count=self.count,
+            timeout=max(self.wait, 1),
+            privileged=self.icmp_privileged,
+        )
+        return bool(host.is_alive)
+
     async def do_ping(self) -> bool:
+        if self.use_icmplib:
+            try:
+                return await self.do_icmplib_ping()
+            except ICMPSocketError as ise:
+                LOG.error(f"Can't use icmplib ({ise}) - Falling back to ping command")
+                self.use_icmplib = False
+
+        return (await run_cmd(self.ping_cmd, self.timeout)).returncode == 0
+
+    def gen_ping_command(self) -> List[str]:
         cmd = ["/usr/bin/ping"]
         if system() == "Darwin":
             cmd = ["/sbin/ping6"] if self.target_ip.version == 6 else ["/sbin/ping"]
         else:
             cmd.extend(["-w", str(self.wait)])
         cmd.extend(["-c", str(self.count), self.target_ip.compressed])
-        return (await run_cmd(cmd, self.timeout)).returncode == 0
+        return cmd
 
     async def check(self) -> bool:
         try:
@@ -76,15 +130,10 @@ def gen_advertise_prefixes(config: Dict) -> Dict:
             LOG.error(f"{prefix} ignored - Invalid IP Network")
             continue
 
-        advertise_prefixes[network_prefix] = []
-
-        if not checkers:
-            continue
-
-        for checker in checkers:
-            advertise_prefixes[network_prefix].append(
-                get_health_checker(checker["class"], checker["kwargs"])
-            )
+        advertise_prefixes[network_prefix] = [
+            get_health_checker(checker["class"], checker["kwargs"])
+            for checker in checkers or ()
+        ]
 
     return advertise_prefixes
 
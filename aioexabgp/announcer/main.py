@@ -4,10 +4,21 @@ import argparse
 import asyncio
 import logging
 import signal
-from json import JSONDecodeError, load
+from json import JSONDecodeError
 from pathlib import Path
 from typing import Dict
 
+try:
+    # orjson.JSONDecodeError subclasses json.JSONDecodeError
+    from orjson import loads
+except ImportError:  # pragma: no cover
+    from json import loads  # type: ignore
+
+try:
+    import uvloop
+except ImportError:  # pragma: no cover
+    uvloop = None
+
 from aioexabgp.announcer import Announcer
 from aioexabgp.announcer.healthcheck import gen_advertise_prefixes
 
@@ -23,8 +34,7 @@ def _load_json_config(config_path: Path) -> Dict:
         return json_conf
 
     try:
-        with config_path.open("r") as cfp:
-            json_conf = load(cfp)
+        json_conf = loads(config_path.read_bytes())
     except JSONDecodeError:
         LOG.error(f"Invalid JSON in {config_path}")
 
@@ -68,6 +78,11 @@ def main() -> int:
     if not config:
         return 69
 
+    if uvloop:
+        # Needs to be set before the Announcer gets the loop
+        LOG.debug("Using uvloop event loop")
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
     LOG.debug("Starting announcer - Config loaded ...")
     advertise_prefixes = gen_advertise_prefixes(config)
     announcer = Announcer(config, advertise_prefixes, dry_run=args.dry_run)
@@ -1,17 +1,39 @@
 #!/usr/bin/env python3
 
 import logging
-from ipaddress import ip_address, ip_network, IPv4Network, IPv6Network
+from functools import lru_cache
+from ipaddress import (
+    ip_address,
+    ip_network,
+    IPv4Address,
+    IPv4Network,
+    IPv6Address,
+    IPv6Network,
+)
 from json import dumps
-from typing import Dict, List, Optional, Sequence, Set, Union
+from typing import AbstractSet, Dict, List, Optional, Set, Union
 
 from aioexabgp.announcer.fibs import FibOperation, FibPrefix
 
 
 # TODO: Plumb up to config
-DEFAULT_FAMALIES = ["ipv4 unicast", "ipv6 unicast"]
+DEFAULT_FAMALIES = frozenset(("ipv4 unicast", "ipv6 unicast"))
+IPAddress = Union[IPv4Address, IPv6Address]
 IPNetwork = Union[IPv4Network, IPv6Network]
 LOG = logging.getLogger(__name__)
+# BGP mostly churns the same prefixes so keep recently parsed ones around
+PREFIX_CACHE_SIZE = 131072
+
+
+# ipaddress parsing is slow pure Python - Cache the objects for repeat updates
+@lru_cache(maxsize=PREFIX_CACHE_SIZE)
+def _ip_network(prefix: str) -> IPNetwork:
+    return ip_network(prefix)
+
+
+@lru_cache(maxsize=4096)
+def _ip_address(address: str) -> IPAddress:
+    return ip_address(address)
 
 
 class ExaBGPParser:
@@ -19,7 +41,7 @@ class ExaBGPParser:
 
     SUPPORTED_API_VERSION = "4.0.1"
 
-    async def parse(
+    def parse(
         self, exa_json: Dict, advertise_prefixes: Optional[Set[IPNetwork]] = None
     ) -> List[FibPrefix]:
         if exa_json["exabgp"] != self.SUPPORTED_API_VERSION:
@@ -27,12 +49,13 @@ class ExaBGPParser:
                 "Exabgp JSON version has changed from know tested version. Investigate"
             )
 
-        if exa_json["type"].lower() == "state":
+        msg_type = exa_json["type"].lower()
+        if msg_type == "state":
             peer = exa_json["neighbor"]["address"]["peer"]
-            state = exa_json["neighbor"]["state"]
-            if state.lower() == "connected":
+            state = exa_json["neighbor"]["state"].lower()
+            if state == "connected":
                 LOG.info(f"Peer {peer}: BGP has reached 'connected' state")
-            elif state.lower() == "down":
+            elif state == "down":
                 reason = exa_json["neighbor"]["reason"]
                 LOG.error(
                     f"Peer {peer}: BGP has reached 'down' state. Reason: {reason}"
@@ -40,32 +63,33 @@ class ExaBGPParser:
                 return [
                     FibPrefix(
                         ip_network("::/0"),
-                        ip_address(peer),
+                        _ip_address(peer),
                         FibOperation.REMOVE_ALL_ROUTES,
                     )
                 ]
-            elif state.lower() == "up":
+            elif state == "up":
                 if not advertise_prefixes:
                     LOG.debug(f"No prefixes to advertise to {peer}")
                     return []
 
+                peer_ip = _ip_address(peer)
                 return [
-                    FibPrefix(prefix, ip_address(peer), FibOperation.ADD_ROUTE)
+                    FibPrefix(prefix, peer_ip, FibOperation.ADD_ROUTE)
                     for prefix in advertise_prefixes
                 ]
             else:
                 LOG.info(f"Peer {peer}: BGP has gone to '{state}' state.")
-        elif exa_json["type"].lower() == "update":
-            return await self.parse_update(exa_json)
+        elif msg_type == "update":
+            return self.parse_update(exa_json)
         else:
             LOG.error(f"exabgp JSON not parsed:\n{dumps(exa_json)}")
 
         return []
 
-    async def parse_update(  # noqa: C901
+    def parse_update(  # noqa: C901
         self,
         exa_json: Dict,
-        wanted_families: Sequence[str] = DEFAULT_FAMALIES,
+        wanted_families: AbstractSet[str] = DEFAULT_FAMALIES,
         direction_wanted: str = "receive",
     ) -> List[FibPrefix]:
         # Ensure this update is the direction we want - Default to receive
@@ -77,25 +101,27 @@ class ExaBGPParser:
             update_json = exa_json["neighbor"]["message"]["update"]
             peer = exa_json["neighbor"]["address"]["peer"]
 
-            for operation, prefixes in update_json.items():
+            for operation, families in update_json.items():
                 if operation == "attribute":
                     continue
 
-                for family, peers in prefixes.items():
+                for family, peers in families.items():
                     if family not in wanted_families:
-                        LOG.debug(f"Ignoring {family} routes from {peer}")
+                        LOG.debug("Ignoring %s routes from %s", family, peer)
                         continue
 
                     if operation == "announce":
-                        for next_hop, prefixes in peers.items():
-                            for prefix in prefixes:
-                                fib_prefixes.append(
-                                    FibPrefix(
-                                        ip_network(prefix["nlri"]),
-                                        ip_address(next_hop),
-                                        FibOperation.ADD_ROUTE,
-                                    )
+                        for next_hop, nlris in peers.items():
+                            # Share one next-hop object with all its prefixes
+                            next_hop_ip = _ip_address(next_hop)
+                            fib_prefixes.extend(
+                                FibPrefix(
+                                    _ip_network(prefix["nlri"]),
+                                    next_hop_ip,
+                                    FibOperation.ADD_ROUTE,
                                 )
+                                for prefix in nlris
+                            )
                         LOG.info(
                             f"Peer {peer}: Sent {len(fib_prefixes)} prefixes to add to"
                             " fibs"
@@ -103,14 +129,15 @@ class ExaBGPParser:
                     elif operation == "withdraw":
                         # TODO: More state to save (who is the next hop for this prefix)
                         # For now, only expect Next Hop Self - Need to document this
-                        for prefix in peers:
-                            fib_prefixes.append(
-                                FibPrefix(
-                                    ip_network(prefix["nlri"]),
-                                    ip_address(peer),
-                                    FibOperation.REMOVE_ROUTE,
-                                )
+                        peer_ip = _ip_address(peer)
+                        fib_prefixes.extend(
+                            FibPrefix(
+                                _ip_network(prefix["nlri"]),
+                                peer_ip,
+                                FibOperation.REMOVE_ROUTE,
                             )
+                            for prefix in peers
+                        )
                         LOG.info(
                             f"Peer {peer}: Sent {len(fib_prefixes)} to remove from fibs"
                         )
@@ -6,11 +6,13 @@ import logging
 import os
 from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from select import select
-from typing import NamedTuple, Optional, Union
+from typing import NamedTuple, Optional, Sequence, Union
 
 
+# os.writev() takes any buffer so we never need to copy into bytes
+BytesLike = Union[bytes, bytearray, memoryview]
 LOG = logging.getLogger(__name__)
+NEWLINE = b"\n"
 
 
 class PipePaths(NamedTuple):
@@ -31,20 +33,23 @@ class ExaBGPPipes:
         read_chunk_size: int = 4096,
     ) -> None:
         self.alock = asyncio.Lock()
+        # Serializes opening + writing so concurrent large writes don't interleave
+        self._write_lock = asyncio.Lock()
         self.executor = executor
         self.loop = asyncio.get_event_loop()
         self.pipe_paths = PipePaths(in_pipe, out_pipe)
         self.read_chunk_size = read_chunk_size
+        # Kept open between reads - Reopened after all writers go away (EOF)
+        self._read_fd: Optional[int] = None
+        # Kept open between writes - Reopened if the reader goes away
+        self._write_fd: Optional[int] = None
 
     async def check_pipes(self) -> bool:
-        """Check that we can stat each pipe"""
-        access_results = await asyncio.gather(
-            self.loop.run_in_executor(
-                self.executor, os.access, self.pipe_paths.in_pipe, os.W_OK
-            ),
-            self.loop.run_in_executor(
-                self.executor, os.access, self.pipe_paths.out_pipe, os.R_OK
-            ),
+        """Check that we can stat each pipe
+        - access() is a quick syscall so not worth an executor thread"""
+        access_results = (
+            os.access(self.pipe_paths.in_pipe, os.W_OK),
+            os.access(self.pipe_paths.out_pipe, os.R_OK),
         )
         for idx, access_success in enumerate(access_results):
             if not access_success:
@@ -52,46 +57,155 @@ class ExaBGPPipes:
 
         return True
 
-    def _read(self) -> bytes:
-        rbuffer = b""
-        try:
-            fd = os.open(self.pipe_paths.in_pipe, os.O_RDONLY | os.O_NONBLOCK)
-            while select([fd], [], [], 0) != ([], [], []):
-                rbuffer = os.read(fd, self.read_chunk_size)
-            return rbuffer
-        finally:
-            os.close(fd)
+    def close(self) -> None:
+        self._close_read()
+        self._close_write()
+
+    def _close_read(self) -> None:
+        if self._read_fd is not None:
+            os.close(self._read_fd)
+            self._read_fd = None
+
+    def _close_write(self) -> None:
+        if self._write_fd is not None:
+            os.close(self._write_fd)
+            self._write_fd = None
+
+    def _read(self, fd: int) -> bytes:
+        """Read everything currently in the FIFO"""
+        rbuffer = bytearray()
+        while True:
+            try:
+                chunk = os.read(fd, self.read_chunk_size)
+            except BlockingIOError:
+                break
+            if not chunk:
+                # All writers have closed - Reopen next read to wait for more
+                self._close_read()
+                break
+            rbuffer += chunk
+        return bytes(rbuffer)
 
     async def read(self, *, timeout: float = 5.0) -> bytes:
-        """Read API response and deserialize it
-        - Wrap blocking read in an executor so it's non blocking
-          and has a customizable timeout
+        """Read API response from the out FIFO
+        - Waits for the FIFO to be readable via the event loop, so no executor
+          thread, then reads all available data
 
         Throws:
             - IOError
             - asyncio.TimeoutError"""
+        if self._read_fd is None:
+            self._read_fd = os.open(
+                self.pipe_paths.out_pipe, os.O_RDONLY | os.O_NONBLOCK
+            )
+        fd = self._read_fd
 
-        return await asyncio.wait_for(
-            self.loop.run_in_executor(self.executor, self._read), timeout=timeout
-        )
+        readable = self.loop.create_future()
 
-    def _write(self, msg: bytes) -> int:
+        def _on_readable() -> None:
+            if not readable.done():
+                readable.set_result(None)
+
+        self.loop.add_reader(fd, _on_readable)
         try:
-            fd = os.open(self.pipe_paths.in_pipe, os.O_WRONLY)
-            return os.write(fd, msg + b"\n")
+            await asyncio.wait_for(readable, timeout=timeout)
         finally:
-            os.close(fd)
-
-    async def write(self, msg: Union[bytes, str], *, timeout: float = 5.0) -> int:
-        """Write str to API FIFO
-        - Wrap blocking write in an executor so it's non blocking
-          and has a customizable timeout
+            self.loop.remove_reader(fd)
+        return self._read(fd)
+
+    def _open_write(self) -> int:
+        # Blocks until ExaBGP has the FIFO open for reading - Hence the executor
+        fd = os.open(self.pipe_paths.in_pipe, os.O_WRONLY)
+        os.set_blocking(fd, False)
+        return fd
+
+    def _close_abandoned_open(self, open_future: "asyncio.Future[int]") -> None:
+        if not open_future.cancelled() and open_future.exception() is None:
+            os.close(open_future.result())
+
+    async def _get_write_fd(self) -> int:
+        if self._write_fd is None:
+            open_future = self.loop.run_in_executor(self.executor, self._open_write)
+            try:
+                self._write_fd = await asyncio.shield(open_future)
+            except asyncio.CancelledError:
+                # The open still completes in the executor - Don't leak its fd
+                open_future.add_done_callback(self._close_abandoned_open)
+                raise
+        return self._write_fd
+
+    async def _wait_writable(self, fd: int) -> None:
+        writable = self.loop.create_future()
+
+        def _on_writable() -> None:
+            if not writable.done():
+                writable.set_result(None)
+
+        self.loop.add_writer(fd, _on_writable)
+        try:
+            await writable
+        finally:
+            self.loop.remove_writer(fd)
+
+    async def _write(self, msg: BytesLike) -> int:
+        """Write msg + a newline on the loop via the non blocking FIFO fd
+        - Only opening the FIFO needs an executor thread
+        - Writes <= PIPE_BUF are all or nothing so only large writes get split
+        - Holds _write_lock so a large write is never interleaved with another"""
+        async with self._write_lock:
+            fd = await self._get_write_fd()
+            total = len(msg) + len(NEWLINE)
+            written = 0
+            try:
+                try:
+                    # Scatter write the newline so we don't copy msg to append it
+                    written = os.writev(fd, (msg, NEWLINE))
+                except BlockingIOError:
+                    pass
+
+                if written < total:
+                    remaining = memoryview(bytes(msg) + NEWLINE)[written:]
+                    while remaining:
+                        await self._wait_writable(fd)
+                        try:
+                            sent = os.write(fd, remaining)
+                        except BlockingIOError:
+                            continue
+                        written += sent
+                        remaining = remaining[sent:]
+            except BrokenPipeError:
+                self._close_write()
+                raise
+            except asyncio.CancelledError:
+                # Timed out part way through msg - Don't append the next write
+                # to half a command on this fd
+                if written:
+                    self._close_write()
+                raise
+            return total
+
+    async def write(self, msg: Union[BytesLike, str], *, timeout: float = 5.0) -> int:
+        """Write str or bytes (like) to API FIFO
+        - Pass bytes to skip encoding ASCII commands every write
+        - Non blocking with a customizable timeout
 
         Throws: IOError, asyncio.TimeoutError"""
 
         if isinstance(msg, str):
             msg = msg.encode("utf-8")
 
-        return await asyncio.wait_for(
-            self.loop.run_in_executor(self.executor, self._write, msg), timeout=timeout
-        )
+        return await asyncio.wait_for(self._write(msg), timeout=timeout)
+
+    async def write_many(
+        self, msgs: Sequence[Union[BytesLike, str]], *, timeout: float = 5.0
+    ) -> int:
+        """Write many messages to the API FIFO with one write() syscall
+        - e.g. announcing or withdrawing a lot of routes at once
+
+        Throws: IOError, asyncio.TimeoutError"""
+        if not msgs:
+            return 0
+
+        # _write adds the final newline
+        msg = NEWLINE.join(m.encode("utf-8") if isinstance(m, str) else m for m in msgs)
+        return await asyncio.wait_for(self._write(msg), timeout=timeout)
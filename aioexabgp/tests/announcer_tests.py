@@ -1,15 +1,22 @@
 #!/usr/bin/env python3
 
 import asyncio
+import os
 import unittest
 from contextlib import redirect_stdout
 from io import StringIO
 from ipaddress import ip_network
+from tempfile import TemporaryFile
+from typing import Dict, List
 from unittest.mock import patch
 
 from aioexabgp.announcer import Announcer
 from aioexabgp.announcer.fibs import FibOperation, FibPrefix
-from aioexabgp.announcer.healthcheck import gen_advertise_prefixes
+from aioexabgp.announcer.healthcheck import (
+    gen_advertise_prefixes,
+    HealthChecker,
+    PingChecker,
+)
 
 # TODO: EXABGP_ANNOUNCE_JSON, WITHDRAW_JSON
 from aioexabgp.tests.announcer_fixtures import ANNOUNCER_CONFIG, NEXT_HOP
@@ -84,11 +91,29 @@ class AnnouncerTests(unittest.TestCase):
 
     def test_nonblock_read(self) -> None:
         line1 = "Line 1\n"
-        fake_stdin = StringIO(f"{line1}line2\n")
-        self.assertEqual(
-            self.loop.run_until_complete(self.aa.nonblock_read(fake_stdin)),
-            line1.strip(),
-        )
+        read_fd, write_fd = os.pipe()
+        os.write(write_fd, f"{line1}line2\n".encode("utf-8"))
+        os.close(write_fd)
+        with open(read_fd, "r") as fake_stdin:
+            self.assertEqual(
+                self.loop.run_until_complete(self.aa.nonblock_read(fake_stdin)),
+                line1.strip(),
+            )
+            self.assertEqual(
+                self.loop.run_until_complete(self.aa.nonblock_read_bytes()), b"line2"
+            )
+            # EOF
+            self.assertEqual(self.loop.run_until_complete(self.aa.nonblock_read()), "")
+
+    def test_learn_stdin_not_a_pipe(self) -> None:
+        with TemporaryFile() as regular_file, patch(
+            "aioexabgp.announcer.stdin", regular_file
+        ), patch("aioexabgp.announcer.LOG.error") as mock_log:
+            # Returns rather than spinning on the ValueError
+            self.assertIsNone(
+                self.loop.run_until_complete(asyncio.wait_for(self.aa.learn(), 1))
+            )
+            self.assertEqual(1, mock_log.call_count)
 
     def test_remove_internal_networks(self) -> None:
         potential_networks = [
@@ -97,12 +122,26 @@ class AnnouncerTests(unittest.TestCase):
             FibPrefix(ip_network("6.9.6.0/24"), None, FibOperation.ADD_ROUTE),
             FibPrefix(ip_network("14:69::/64"), None, FibOperation.ADD_ROUTE),
             FibPrefix(ip_network("11:69::/64"), None, FibOperation.ADD_ROUTE),
+            FibPrefix(ip_network("6.9.6.0/24"), None, FibOperation.ADD_ROUTE),
+        ]
+        # Ensure we dedupe + keep the order exabgp sent us
+        self.assertEqual(
+            self.aa.remove_internal_networks(potential_networks),
+            [potential_networks[2], potential_networks[3], potential_networks[4]],
+        )
+
+    def test_remove_internal_networks_learn_only(self) -> None:
+        self.aa.advertise_prefixes = {}
+        potential_networks = [
+            FibPrefix(ip_network("69::/32"), None, FibOperation.ADD_ROUTE),
+            FibPrefix(ip_network("6.9.6.0/24"), None, FibOperation.ADD_ROUTE),
+            FibPrefix(ip_network("69::/32"), None, FibOperation.ADD_ROUTE),
         ]
-        # Making list in specific way to ensure return is sorted()
         self.assertEqual(
             self.aa.remove_internal_networks(potential_networks),
-            [potential_networks[2], potential_networks[-1], potential_networks[-2]],
+            potential_networks[:2],
         )
+        self.assertFalse(self.aa._internal_network_cache)
 
     def test_ensure_default_remove_internal_networks(self) -> None:
         potential_networks = [
@@ -111,3 +150,100 @@ class AnnouncerTests(unittest.TestCase):
         self.assertEqual(
             self.aa.remove_internal_networks(potential_networks), potential_networks
         )
+
+    def test_remove_internal_networks_supernet(self) -> None:
+        # 69::/32 + 70::/32 are both within ::/8
+        potential_networks = [
+            FibPrefix(ip_network("::/8"), None, FibOperation.ADD_ROUTE),
+            FibPrefix(ip_network("100::/8"), None, FibOperation.ADD_ROUTE),
+        ]
+        self.assertEqual(
+            self.aa.remove_internal_networks(potential_networks),
+            [potential_networks[1]],
+        )
+
+    def test_is_internal_network_cache(self) -> None:
+        self.assertTrue(self.aa._is_internal_network(ip_network("69::/64")))
+        self.assertIn(ip_network("69::/64"), self.aa._internal_network_cache)
+        # Reassigning our advertise prefixes invalidates the cache
+        self.aa.advertise_prefixes = {}
+        self.assertFalse(self.aa._internal_network_cache)
+        self.assertFalse(self.aa._is_internal_network(ip_network("69::/64")))
+
+    def test_partition_prefixes(self) -> None:
+        six_nine, seven_zero = sorted(self.aa.advertise_prefixes.keys())
+        advertise_prefixes = self.aa.advertise_prefixes
+        advertise_prefixes[six_nine].append(advertise_prefixes[six_nine][0])
+        self.aa.advertise_prefixes = advertise_prefixes
+        # 69::/32 has 2 checks and 70::/32 has 1
+        self.assertEqual(
+            ([six_nine, seven_zero], []),
+            self.aa._partition_prefixes([True, True, True]),
+        )
+        self.assertEqual(
+            ([seven_zero], [six_nine]),
+            self.aa._partition_prefixes([True, False, True]),
+        )
+        self.assertEqual(
+            ([six_nine], [seven_zero]),
+            self.aa._partition_prefixes([True, True, ValueError("Failed")]),
+        )
+
+    def test_run_healthchecks(self) -> None:
+        async def slow_check() -> bool:
+            await asyncio.sleep(10)
+            return True
+
+        six_nine, seven_zero = sorted(self.aa.advertise_prefixes.keys())
+        self.aa.advertise_prefixes[six_nine][0].check = slow_check  # type: ignore
+        with patch(
+            "aioexabgp.announcer.healthcheck.PingChecker.check", return_value=True
+        ):
+            self.aa.advertise_prefixes = self.aa.advertise_prefixes
+            results = self.loop.run_until_complete(self.aa._run_healthchecks(0.1))
+        self.assertIsInstance(results[0], asyncio.TimeoutError)
+        self.assertEqual(
+            ([seven_zero], [six_nine]), self.aa._partition_prefixes(results)
+        )
+
+    def test_run_healthchecks_bounded(self) -> None:
+        running: List[int] = [0, 0]  # Current, Max
+
+        async def counting_check() -> bool:
+            running[0] += 1
+            running[1] = max(running)
+            await asyncio.sleep(0.01)
+            running[0] -= 1
+            return True
+
+        self.aa._check_semaphore = asyncio.Semaphore(1)
+        self.aa._healthchecks = [counting_check] * 3
+        results = self.loop.run_until_complete(self.aa._run_healthchecks(0.1))
+        self.assertEqual([True] * 3, results)
+        self.assertEqual(1, running[1])
+
+    def test_healthcheck_cache_ttl(self) -> None:
+        checker = PingChecker({"ping_target": "69::69", "cache_ttl": 60})
+        with patch.object(checker, "check", return_value=True) as mock_check:
+            for _ in range(2):
+                self.assertTrue(self.loop.run_until_complete(checker.cached_check()))
+            self.assertEqual(1, mock_check.call_count)
+
+            # No TTL checks every time
+            checker.cache_ttl = 0
+            self.loop.run_until_complete(checker.cached_check())
+            self.assertEqual(2, mock_check.call_count)
+
+    def test_healthcheck_cache_no_super_init(self) -> None:
+        class NoInitChecker(HealthChecker):
+            def __init__(self, config: Dict) -> None:
+                self.config = config
+
+            async def check(self) -> bool:
+                return True
+
+        checker = NoInitChecker({})
+        self.assertTrue(self.loop.run_until_complete(checker.cached_check()))
+
+    def test_learn_queue_max(self) -> None:
+        self.assertEqual(Announcer.LEARN_QUEUE_MAX, self.aa.learn_queue.maxsize)
@@ -1,19 +1,26 @@
 #!/usr/bin/env python3
 
 import unittest
-from asyncio import get_event_loop
+from asyncio import CancelledError, gather, get_event_loop, Queue, sleep
+from errno import EEXIST, ESRCH
 from ipaddress import ip_address, ip_network
-from typing import List, Sequence
-from unittest.mock import patch
+from subprocess import CompletedProcess
+from typing import Any, List, Sequence
+from unittest.mock import Mock, patch
 
 from aioexabgp.announcer.fibs import (
+    _coalesce_fib_batches,
     _update_learnt_routes,
     BGP_LEARNT_PREFIXES,
     Fib,
+    fib_operation_runner,
     FibOperation,
     FibPrefix,
     get_fib,
     LinuxFib,
+    NetlinkError,
+    NetlinkFib,
+    prefix_consumer,
 )
 from aioexabgp.tests import fibs_tests_fixtures
 
@@ -41,6 +48,13 @@ def gen_fib_operations(
     return fib_ops
 
 
+def fake_netlink_route(dst: str, dst_len: int, gateway: str) -> Mock:
+    attrs = {"RTA_DST": dst, "RTA_GATEWAY": gateway}
+    route = Mock(get_attr=attrs.get)
+    route.__getitem__ = Mock(return_value=dst_len)
+    return route
+
+
 class FibsTests(unittest.TestCase):
     def setUp(self) -> None:
         self.afib = Fib(FAKE_CONFIG)
@@ -62,6 +76,12 @@ class FibsTests(unittest.TestCase):
         self.assertTrue(self.afib.is_link_local(ip_network("169.254.69.0/24")))
         self.assertFalse(self.afib.is_link_local(ip_address("6.9.6.9")))
         self.assertFalse(self.afib.is_link_local(ip_network("6.9.6.0/24")))
+        # Supernets + range edges
+        self.assertTrue(self.afib.is_link_local(ip_network("169.0.0.0/8")))
+        self.assertTrue(self.afib.is_link_local(ip_address("169.254.255.255")))
+        self.assertFalse(self.afib.is_link_local(ip_address("169.255.0.0")))
+        self.assertTrue(self.afib.is_link_local(ip_network("fe00::/7")))
+        self.assertFalse(self.afib.is_link_local(ip_address("fec0::")))
 
     def test_add_route(self) -> None:
         default_prefix = ip_network("::/0")
@@ -93,6 +113,103 @@ class FibsTests(unittest.TestCase):
         # Restore default allow ll
         self.afib.allow_ll_nexthop = True
 
+    def test_apply_operations_concurrency(self) -> None:
+        running = 0
+        max_running = 0
+
+        async def slow_add_route(*args: Any) -> bool:
+            nonlocal running, max_running
+            running += 1
+            max_running = max(running, max_running)
+            await sleep(0.01)
+            running -= 1
+            return True
+
+        fib_ops = [
+            FibPrefix(
+                ip_network(f"69:{i}::/64"),
+                ip_address("2469::1"),
+                FibOperation.ADD_ROUTE,
+            )
+            for i in range(10)
+        ]
+        self.afib.concurrency = 3
+        with patch(f"{BASE_MODULE}.Fib.add_route", side_effect=slow_add_route):
+            self.assertTrue(
+                all(self.loop.run_until_complete(self.afib.apply_operations(fib_ops)))
+            )
+        self.assertEqual(3, max_running)
+
+    def test_coalesce_fib_batches(self) -> None:
+        next_hop = ip_address("2469::1")
+        add_69 = FibPrefix(NETWORK_PREFIXES[1], next_hop, FibOperation.ADD_ROUTE)
+        del_69 = FibPrefix(NETWORK_PREFIXES[1], next_hop, FibOperation.REMOVE_ROUTE)
+        add_70 = FibPrefix(ip_network("70::/64"), next_hop, FibOperation.ADD_ROUTE)
+        del_71 = FibPrefix(ip_network("71::/64"), next_hop, FibOperation.REMOVE_ROUTE)
+        remove_all = FibPrefix(
+            ip_network("::/0"), next_hop, FibOperation.REMOVE_ALL_ROUTES
+        )
+
+        # Added + removed before programming = nothing to do
+        # We did not add 71::/64 so it may predate us - still remove it
+        self.assertEqual(
+            [[add_70, del_71]],
+            list(_coalesce_fib_batches([[add_69, add_70], [del_71, del_69]])),
+        )
+        # REMOVE_ALL_ROUTES splits updates
+        self.assertEqual(
+            [[remove_all], [add_69]],
+            list(_coalesce_fib_batches([[add_69], [del_69], [remove_all], [add_69]])),
+        )
+        # Don't re-add learnt routes
+        BGP_LEARNT_PREFIXES[NETWORK_PREFIXES[1]] = {next_hop}
+        self.assertEqual(
+            [[add_70]], list(_coalesce_fib_batches([[del_69, add_69], [add_70]]))
+        )
+        BGP_LEARNT_PREFIXES.clear()
+
+    def test_fib_operation_runner(self) -> None:
+        fibs = {"Fib": self.afib, "Fib2": self.afib}
+        fib_ops = list(gen_fib_operations(FibOperation.ADD_ROUTE))
+        # Invalid operations should not generate route tasks
+        fib_ops.append(FibPrefix(ip_network("70::/64"), None, FibOperation.ADD_ROUTE))
+        fib_ops.append(FibPrefix(ip_network("71::/64"), None, FibOperation.NOTHING))
+
+        with patch(f"{BASE_MODULE}.Fib.add_route", return_value=True) as mar:
+            self.loop.run_until_complete(fib_operation_runner(fibs, fib_ops, True))
+            self.assertEqual(0, mar.call_count)
+            self.assertFalse(BGP_LEARNT_PREFIXES)
+
+            self.loop.run_until_complete(fib_operation_runner(fibs, fib_ops, False))
+            # 2 valid operations to 2 FIBs
+            self.assertEqual(4, mar.call_count)
+            self.assertEqual(set(NETWORK_PREFIXES), set(BGP_LEARNT_PREFIXES))
+
+        # Only update learnt prefixes for operations that succeeded
+        with patch(f"{BASE_MODULE}.Fib.del_route", side_effect=[True, False]):
+            self.loop.run_until_complete(
+                fib_operation_runner(
+                    {"Fib": self.afib},
+                    gen_fib_operations(FibOperation.REMOVE_ROUTE),
+                    False,
+                )
+            )
+        self.assertEqual([NETWORK_PREFIXES[1]], list(BGP_LEARNT_PREFIXES))
+        BGP_LEARNT_PREFIXES.clear()
+
+        # A FIB raising should not stop other FIBs being programmed
+        lfib = LinuxFib(FAKE_CONFIG)
+        with patch(
+            f"{BASE_MODULE}.Fib.add_route", return_value=True
+        ) as mock_add, patch(
+            f"{BASE_MODULE}.LinuxFib.apply_operations", side_effect=OSError("sudo")
+        ):
+            self.loop.run_until_complete(
+                fib_operation_runner({"Fib": self.afib, "Linux": lfib}, fib_ops, False)
+            )
+            self.assertEqual(2, mock_add.call_count)
+        self.assertFalse(BGP_LEARNT_PREFIXES)
+
     def test_get_fib(self) -> None:
         # Here we on purpose do not use FAKE_CONFIG
         bs_config = {"learn": {}}
@@ -102,6 +219,20 @@ class FibsTests(unittest.TestCase):
         with self.assertRaises(ValueError):
             get_fib("JunOS", bs_config)
 
+        with patch(f"{BASE_MODULE}.IPRoute", None), self.assertRaises(ValueError):
+            get_fib("Netlink", bs_config)
+
+    def test_prefix_consumer_closes_fibs(self) -> None:
+        with patch(f"{BASE_MODULE}.LinuxFib.close") as mock_close:
+            consumer = self.loop.create_task(
+                prefix_consumer(Queue(), ["Linux"], {"learn": {}})
+            )
+            self.loop.run_until_complete(sleep(0))
+            consumer.cancel()
+            with self.assertRaises(CancelledError):
+                self.loop.run_until_complete(consumer)
+            self.assertEqual(1, mock_close.call_count)
+
     def test_update_learnt_routes(self) -> None:
         # Make sure dict is empty
         self.assertFalse(BGP_LEARNT_PREFIXES)
@@ -148,6 +279,101 @@ class LinuxFibTests(unittest.TestCase):
         self.lfib = LinuxFib(FAKE_CONFIG)
         self.loop = get_event_loop()
 
+    def test_apply_operations(self) -> None:
+        fib_ops = list(gen_fib_operations(FibOperation.ADD_ROUTE))
+        fib_ops.append(
+            FibPrefix(
+                ip_network("10.6.9.0/24"),
+                ip_address("fd00::4"),
+                FibOperation.REMOVE_ROUTE,
+            )
+        )
+        # Link local next-hops are not allowed so never get to `ip`
+        self.lfib.allow_ll_nexthop = False
+        fib_ops.append(
+            FibPrefix(
+                ip_network("70::/64"), ip_address("fe80::1"), FibOperation.ADD_ROUTE
+            )
+        )
+
+        failed_cp = CompletedProcess(
+            args=[], returncode=1, stdout="", stderr="Command failed -:2\n"
+        )
+        with patch(f"{BASE_MODULE}.run_cmd", return_value=failed_cp) as mock_run:
+            self.assertEqual(
+                [True, False, True, False],
+                self.loop.run_until_complete(self.lfib.apply_operations(fib_ops)),
+            )
+            self.assertEqual(1, mock_run.call_count)
+            self.assertEqual(
+                "route add ::/0 via 2469::1 metric 31337\n"
+                + "route add 69::/64 via 2469::1 metric 31337\n"
+                + "route delete 10.6.9.0/24 via inet6 fd00::4 metric 31337\n",
+                mock_run.call_args.kwargs["input"],
+            )
+
+        # Fail every operation if we can't tell what failed
+        failed_cp.stderr = "sudo: a password is required"
+        with patch(f"{BASE_MODULE}.run_cmd", return_value=failed_cp):
+            self.assertEqual(
+                [False, False, False, False],
+                self.loop.run_until_complete(self.lfib.apply_operations(fib_ops)),
+            )
+        self.lfib.allow_ll_nexthop = True
+
+    def test_apply_operations_unparsable_batch(self) -> None:
+        fib_ops = [
+            FibPrefix(
+                ip_network("69::/64"), ip_address("2469::1"), FibOperation.ADD_ROUTE
+            ),
+            FibPrefix(
+                ip_network("70::/64"), ip_address("10.1.1.1"), FibOperation.ADD_ROUTE
+            ),
+            FibPrefix(
+                ip_network("71::/64"), ip_address("2469::1"), FibOperation.ADD_ROUTE
+            ),
+        ]
+        per_route_cmds: List[Sequence[str]] = []
+
+        async def fake_run_cmd(cmd: Sequence[str], *args: Any, **kwargs: Any) -> Any:
+            if "-batch" in cmd:
+                # ip gives up on line 2 without a "Command failed" line
+                return CompletedProcess(
+                    cmd, 1, "", "Error: inet6 address is expected rather than ..."
+                )
+            if "show" in cmd:
+                # Line 1 made it into the kernel before ip stopped
+                return CompletedProcess(
+                    cmd, 0, "69::/64 via 2469::1 dev eth0 metric 31337\n", ""
+                )
+            per_route_cmds.append(cmd)
+            return CompletedProcess(cmd, 0 if "71::/64" in cmd else 2, "", "")
+
+        with patch(f"{BASE_MODULE}.run_cmd", fake_run_cmd):
+            self.assertEqual(
+                [True, False, True],
+                self.loop.run_until_complete(self.lfib.apply_operations(fib_ops)),
+            )
+        # Only routes not already in the kernel are retried
+        self.assertEqual(2, len(per_route_cmds))
+
+    def test_apply_operations_no_batch(self) -> None:
+        self.lfib.batch_routes = False
+        ok_cp = CompletedProcess(args=[], returncode=0, stdout="", stderr="")
+        with patch(f"{BASE_MODULE}.run_cmd", return_value=ok_cp) as mock_run:
+            self.assertEqual(
+                [True, True],
+                self.loop.run_until_complete(
+                    self.lfib.apply_operations(
+                        gen_fib_operations(FibOperation.ADD_ROUTE)
+                    )
+                ),
+            )
+            # A route at a time - No `ip -batch`
+            self.assertEqual(2, mock_run.call_count)
+            for call in mock_run.call_args_list:
+                self.assertNotIn("-batch", call.args[0])
+
     def test_check_for_route(self) -> None:
         # v4 check if it exists
         with patch(f"{BASE_MODULE}.run_cmd", return_value=fibs_tests_fixtures.V4_CP):
@@ -173,6 +399,14 @@ class LinuxFibTests(unittest.TestCase):
                     )
                 )
             )
+            # Don't match a prefix that only contains ours
+            self.assertFalse(
+                self.loop.run_until_complete(
+                    self.lfib.check_for_route(
+                        ip_network("0.255.0.0/16"), ip_address("10.1.1.3")
+                    )
+                )
+            )
         # v6 check if it exists
         with patch(f"{BASE_MODULE}.run_cmd", return_value=fibs_tests_fixtures.V6_CP):
             self.assertTrue(
@@ -190,6 +424,20 @@ class LinuxFibTests(unittest.TestCase):
                 )
             )
 
+    def test_get_route_table(self) -> None:
+        with patch(
+            f"{BASE_MODULE}.run_cmd", return_value=fibs_tests_fixtures.V4_CP
+        ) as mock_run:
+            # Concurrent fetches of the same table share one `ip` process
+            route_tables = self.loop.run_until_complete(
+                gather(self.lfib.get_route_table(4), self.lfib.get_route_table(4))
+            )
+            self.assertEqual([fibs_tests_fixtures.V4_CP] * 2, route_tables)
+            self.assertEqual(1, mock_run.call_count)
+            # Once done the next fetch runs `ip` again
+            self.loop.run_until_complete(self.lfib.get_route_table(4))
+            self.assertEqual(2, mock_run.call_count)
+
     def test_del_all_routes(self) -> None:
         # Test delete all with a nexthop
         with patch(
@@ -216,8 +464,9 @@ class LinuxFibTests(unittest.TestCase):
             self.assertTrue(
                 self.loop.run_until_complete(self.lfib.del_all_routes(None))
             )
-            # 2 prefix/route from v4 and 1 from v6 table
-            self.assertEqual(3, mock_del_route.call_count)
+            # 2 prefix/route from v4 and 2 from v6 table
+            self.assertEqual(4, mock_del_route.call_count)
+            mock_del_route.assert_any_call(ip_network("::/0"), ip_address("fd00::69"))
 
     def test_gen_route_cmd(self) -> None:
         # test v4 via v6
@@ -277,3 +526,78 @@ class LinuxFibTests(unittest.TestCase):
             ],
             self.lfib.gen_route_command("delete", sixty_nine_prefix, v6_next_hop),
         )
+
+
+class NetlinkFibTests(unittest.TestCase):
+    def setUp(self) -> None:
+        with patch(f"{BASE_MODULE}.IPRoute"):
+            self.nfib = NetlinkFib(FAKE_CONFIG)
+        self.loop = get_event_loop()
+
+    def tearDown(self) -> None:
+        self.nfib.close()
+
+    def test_add_route(self) -> None:
+        self.assertTrue(
+            self.loop.run_until_complete(
+                self.nfib.add_route(ip_network("10.6.9.0/24"), ip_address("fd00::4"))
+            )
+        )
+        self.nfib.ipr.route.assert_called_with(
+            "add",
+            dst="10.6.9.0/24",
+            family=NetlinkFib.FAMILIES[4],
+            priority=NetlinkFib.METRIC,
+            via={"family": NetlinkFib.FAMILIES[6], "addr": "fd00::4"},
+        )
+
+        # Existing routes via our next hop are a success - Other errors are not
+        for code, gateway, expected in (
+            (EEXIST, "fd00::4", True),
+            (EEXIST, "fd00::5", False),
+            (ESRCH, "fd00::4", False),
+        ):
+            self.nfib.ipr.route.side_effect = NetlinkError(code)
+            self.nfib.ipr.get_routes.return_value = [
+                fake_netlink_route("69::", 64, gateway)
+            ]
+            self.assertEqual(
+                expected,
+                self.loop.run_until_complete(
+                    self.nfib.add_route(ip_network("69::/64"), ip_address("fd00::4"))
+                ),
+            )
+
+    def test_apply_operations(self) -> None:
+        fib_ops = list(gen_fib_operations(FibOperation.ADD_ROUTE))
+        fib_ops.append(
+            FibPrefix(
+                ip_network("69::/64"), ip_address("2469::1"), FibOperation.REMOVE_ROUTE
+            )
+        )
+        self.nfib.default_allowed = False
+        self.assertEqual(
+            [False, True, True],
+            self.loop.run_until_complete(self.nfib.apply_operations(fib_ops)),
+        )
+        self.assertEqual(
+            ["add", "del"],
+            [call.args[0] for call in self.nfib.ipr.route.call_args_list],
+        )
+        self.nfib.default_allowed = True
+
+    def test_del_all_routes(self) -> None:
+        self.nfib.ipr.get_routes.side_effect = [
+            [fake_netlink_route("10.6.9.0", 24, "10.1.1.1")],
+            [
+                fake_netlink_route("", 0, "fd00::4"),
+                fake_netlink_route("69::", 64, "fd00::5"),
+            ],
+        ]
+        with patch(f"{BASE_MODULE}.NetlinkFib.del_route", return_value=True) as mdr:
+            self.assertTrue(
+                self.loop.run_until_complete(
+                    self.nfib.del_all_routes(ip_address("fd00::4"))
+                )
+            )
+            mdr.assert_called_once_with(ip_network("::/0"), ip_address("fd00::4"))
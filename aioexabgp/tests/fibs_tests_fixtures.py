@@ -17,6 +17,7 @@ V4_CP = CompletedProcess(args=None, returncode=0, stdout=V4_ROUTES)
 
 V6_ROUTES = """\
 fd00:70::/64 via fd00::4 dev wg0 metric 31337
+default via fd00::69 dev wg0 metric 31337 pref medium
 fc00::/7 via fe80::3 dev vlan69 proto static metric 1469 pref medium
 default via fe80::201:5cff:fe7e:8446 dev ens2f0 proto ra metric 1012 expires 8997sec pref medium
 """
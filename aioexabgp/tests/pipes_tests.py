@@ -2,17 +2,19 @@
 
 import os
 import unittest
-from asyncio import get_event_loop, TimeoutError
+from asyncio import gather, get_event_loop, sleep as asyncio_sleep, TimeoutError
 from pathlib import Path
 from tempfile import gettempdir
 from time import sleep
+from typing import List, Union
 from unittest.mock import patch
 
 from aioexabgp import pipes
 
 
-def sleep_1_second(*args, **kwargs) -> None:
+def sleep_1_second(*args, **kwargs) -> int:
     sleep(1)
+    return os.open(os.devnull, os.O_WRONLY)
 
 
 class ExaBGPPipesTests(unittest.TestCase):
@@ -25,6 +27,7 @@ class ExaBGPPipesTests(unittest.TestCase):
         self.loop = get_event_loop()
 
     def tearDown(self) -> None:
+        self.exabgppipes.close()
         for a_pipe in (self.in_pipe, self.out_pipe):
             try:
                 a_pipe.unlink()
@@ -39,7 +42,115 @@ class ExaBGPPipesTests(unittest.TestCase):
     def test_check_pipe(self) -> None:
         self.assertTrue(self.loop.run_until_complete(self.exabgppipes.check_pipes()))
 
-    @patch("aioexabgp.pipes.ExaBGPPipes._write", sleep_1_second)
+    def test_read(self) -> None:
+        read_task = self.loop.create_task(self.exabgppipes.read(timeout=1))
+        # Let read() open the FIFO so we can open the write side
+        self.loop.run_until_complete(asyncio_sleep(0))
+        write_fd = os.open(self.out_pipe, os.O_WRONLY | os.O_NONBLOCK)
+        os.write(write_fd, b"a" * 5000 + b"\n")
+        os.close(write_fd)
+        # All chunks are returned
+        self.assertEqual(b"a" * 5000 + b"\n", self.loop.run_until_complete(read_task))
+
+    def test_read_timeout(self) -> None:
+        with self.assertRaises(TimeoutError):
+            self.loop.run_until_complete(self.exabgppipes.read(timeout=0.1))
+
+    def test_write(self) -> None:
+        read_fd = os.open(self.in_pipe, os.O_RDONLY | os.O_NONBLOCK)
+        try:
+            for msg in (
+                "announce route 69::/64",
+                memoryview(b"withdraw route 69::/64"),
+            ):
+                self.loop.run_until_complete(self.exabgppipes.write(msg))
+            # One fd is reused for every write
+            self.assertIsNotNone(self.exabgppipes._write_fd)
+            self.assertEqual(
+                b"announce route 69::/64\nwithdraw route 69::/64\n",
+                os.read(read_fd, 4096),
+            )
+        finally:
+            os.close(read_fd)
+
+    def test_write_larger_than_pipe(self) -> None:
+        msg = b"a" * (2**18)
+        read_fd = os.open(self.in_pipe, os.O_RDONLY | os.O_NONBLOCK)
+        received = bytearray()
+
+        async def reader() -> None:
+            while len(received) <= len(msg):
+                await asyncio_sleep(0.001)
+                try:
+                    received.extend(os.read(read_fd, 2**16))
+                except BlockingIOError:
+                    pass
+
+        try:
+            # The FIFO fills so write() has to wait for it to drain
+            self.loop.run_until_complete(
+                gather(self.exabgppipes.write(msg, timeout=5), reader())
+            )
+            self.assertEqual(msg + b"\n", received)
+        finally:
+            os.close(read_fd)
+
+    def test_write_concurrent(self) -> None:
+        msgs = (b"a" * 200000, b"b" * 200000)
+        read_fd = os.open(self.in_pipe, os.O_RDONLY | os.O_NONBLOCK)
+        received = bytearray()
+
+        async def reader() -> None:
+            while len(received) < sum(len(m) + 1 for m in msgs):
+                await asyncio_sleep(0.001)
+                try:
+                    received.extend(os.read(read_fd, 2**16))
+                except BlockingIOError:
+                    pass
+
+        try:
+            self.loop.run_until_complete(
+                gather(*(self.exabgppipes.write(m) for m in msgs), reader())
+            )
+            # Each message arrives whole - Not interleaved
+            self.assertEqual(msgs[0] + b"\n" + msgs[1] + b"\n", received)
+        finally:
+            os.close(read_fd)
+
+    def test_write_partial_timeout(self) -> None:
+        read_fd = os.open(self.in_pipe, os.O_RDONLY | os.O_NONBLOCK)
+        try:
+            # Nothing reads so the FIFO fills part way through msg
+            with self.assertRaises(TimeoutError):
+                self.loop.run_until_complete(
+                    self.exabgppipes.write(b"a" * (2**18), timeout=0.1)
+                )
+            # The fd with half a command written is not reused
+            self.assertIsNone(self.exabgppipes._write_fd)
+        finally:
+            os.close(read_fd)
+
+    def test_write_many(self) -> None:
+        read_fd = os.open(self.in_pipe, os.O_RDONLY | os.O_NONBLOCK)
+        try:
+            msgs: List[Union[bytes, str]] = [
+                "announce route 69::/64",
+                b"announce route 70::/64",
+            ]
+            with patch("aioexabgp.pipes.os.writev", wraps=os.writev) as mock_write:
+                self.loop.run_until_complete(self.exabgppipes.write_many(msgs))
+                self.assertEqual(1, mock_write.call_count)
+            self.assertEqual(
+                b"announce route 69::/64\nannounce route 70::/64\n",
+                os.read(read_fd, 4096),
+            )
+            self.assertEqual(
+                0, self.loop.run_until_complete(self.exabgppipes.write_many([]))
+            )
+        finally:
+            os.close(read_fd)
+
+    @patch("aioexabgp.pipes.ExaBGPPipes._open_write", sleep_1_second)
     def test_write_timeout(self) -> None:
         with self.assertRaises(TimeoutError):
             self.loop.run_until_complete(self.exabgppipes.write("s", timeout=0.5))
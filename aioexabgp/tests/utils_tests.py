@@ -2,6 +2,7 @@
 
 import asyncio
 import unittest
+from ipaddress import ip_network
 
 from unittest.mock import Mock, patch
 
@@ -24,9 +25,67 @@ class UtilsTests(unittest.TestCase):
                 utils.run_cmd(("grep", "CatDog69", "/etc/hosts"))
             ).returncode,
         )
+        # STDIN
+        cp = loop.run_until_complete(utils.run_cmd(("cat",), input="Hello STDIN\n"))
+        self.assertEqual("Hello STDIN\n", cp.stdout)
         # Timeout
         self.assertEqual(
             -1, loop.run_until_complete(utils.run_cmd(("sleep", "6.9"), 0.5)).returncode
         )
         # Show we logged each failure
         self.assertEqual(mock_log.call_count, 2)
+
+    def test_run_cmd_cancelled(self) -> None:
+        loop = asyncio.get_event_loop()
+        real_kill = asyncio.subprocess.Process.kill
+        with patch.object(
+            asyncio.subprocess.Process, "kill", autospec=True, side_effect=real_kill
+        ) as mock_kill:
+            # An outer timeout cancels run_cmd before its own timeout
+            with self.assertRaises(asyncio.TimeoutError):
+                loop.run_until_complete(
+                    asyncio.wait_for(utils.run_cmd(("sleep", "6.9"), 5), 0.3)
+                )
+            self.assertIsNotNone(mock_kill.call_args[0][0].returncode)
+
+
+class PrefixTrieTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.trie = utils.PrefixTrie(
+            (ip_network("69::/32"), ip_network("69:1::/48"), ip_network("10.0.0.0/8"))
+        )
+
+    def test_contains(self) -> None:
+        self.assertEqual(3, len(self.trie))
+        self.assertTrue(ip_network("69::/32") in self.trie)
+        self.assertFalse(ip_network("69::/64") in self.trie)
+        self.assertFalse(ip_network("10.0.0.0/16") in self.trie)
+        self.assertFalse(utils.PrefixTrie())
+
+    def test_longest_match(self) -> None:
+        self.assertEqual(
+            ip_network("69:1::/48"),
+            self.trie.longest_match(ip_network("69:1:0:69::/64")),
+        )
+        self.assertEqual(
+            ip_network("69::/32"), self.trie.longest_match(ip_network("69::/64"))
+        )
+        self.assertEqual(
+            ip_network("10.0.0.0/8"),
+            self.trie.longest_match(ip_network("10.6.9.0/24")),
+        )
+        self.assertIsNone(self.trie.longest_match(ip_network("11.0.0.0/8")))
+        # Same bits different address family
+        self.assertIsNone(self.trie.longest_match(ip_network("a00::/8")))
+
+    def test_overlaps(self) -> None:
+        # Subnets
+        self.assertTrue(self.trie.overlaps(ip_network("69::/64")))
+        self.assertTrue(self.trie.overlaps(ip_network("10.6.9.0/24")))
+        # Supernets
+        self.assertTrue(self.trie.overlaps(ip_network("::/8")))
+        self.assertTrue(self.trie.overlaps(ip_network("0.0.0.0/0")))
+        # Neither
+        self.assertFalse(self.trie.overlaps(ip_network("70::/32")))
+        self.assertFalse(self.trie.overlaps(ip_network("11.0.0.0/8")))
+        self.assertFalse(self.trie.overlaps(ip_network("8000::/1")))
@@ -2,23 +2,48 @@
 
 import asyncio
 import logging
+from bisect import insort
+from ipaddress import IPv4Network, IPv6Network
 from subprocess import CompletedProcess
-from typing import Sequence
-
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
 
+IPNetwork = Union[IPv4Network, IPv6Network]
 LOG = logging.getLogger(__name__)
 
 
+async def _kill_process(process: asyncio.subprocess.Process) -> None:
+    # Don't leave hung commands (e.g. ping) running + piling up
+    if process.returncode is None:
+        process.kill()
+        await process.wait()
+
+
 async def run_cmd(
-    cmd: Sequence[str], timeout: float = 10.0, encoding: str = "utf-8"
+    cmd: Sequence[str],
+    timeout: float = 10.0,
+    encoding: str = "utf-8",
+    *,
+    input: Optional[str] = None,
 ) -> CompletedProcess:
+    """Run cmd without blocking the loop - input is written to its STDIN"""
     process = await asyncio.create_subprocess_exec(
-        *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        *cmd,
+        stdin=asyncio.subprocess.PIPE if input is not None else None,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
     )
+    stdin_bytes = input.encode(encoding) if input is not None else None
     try:
-        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+        stdout, stderr = await asyncio.wait_for(
+            process.communicate(stdin_bytes), timeout
+        )
+    except asyncio.CancelledError:
+        # Cancelled from outside (e.g. a caller's wait_for) - Still reap cmd
+        await _kill_process(process)
+        raise
     except asyncio.TimeoutError:
-        LOG.error(f"{' '.join(cmd)} asyncio timed out")
+        LOG.error("%s asyncio timed out", " ".join(cmd))
+        await _kill_process(process)
         return CompletedProcess(
             args=cmd,
             returncode=-1,
@@ -27,7 +52,7 @@ async def run_cmd(
         )
 
     if process.returncode is None:
-        LOG.error(f"{' '.join(cmd)} didn't return a returncode ...")
+        LOG.error("%s didn't return a returncode ...", " ".join(cmd))
         return CompletedProcess(
             args=cmd,
             returncode=-2,
@@ -43,9 +68,69 @@ async def run_cmd(
     )
 
     if cp.returncode != 0:
+        # Output can be large (e.g. ip -batch) so let logging format it lazily
         LOG.error(
-            f"{' '.join(cmd)} returned {cp.returncode}:\nSTDERR: {cp.stderr}\n"
-            + f"STDOUT: {cp.stdout}"
+            "%s returned %d:\nSTDERR: %s\nSTDOUT: %s",
+            " ".join(cmd),
+            cp.returncode,
+            cp.stderr,
+            cp.stdout,
         )
 
     return cp
+
+
+class PrefixTrie:
+    """Binary CIDR trie of IPv4 + IPv6 networks for fast overlap checks
+
+    Every node on the path from the root to a stored network is keyed on
+    (version, depth, leading network bits) so a lookup is one hash per distinct
+    stored prefix length instead of an overlaps() scan of every stored network"""
+
+    def __init__(self, networks: Iterable[IPNetwork] = ()) -> None:
+        self._nodes: Set[Tuple[int, int, int]] = set()
+        self._terminals: Dict[Tuple[int, int, int], IPNetwork] = {}
+        self._terminal_lens: Dict[int, List[int]] = {4: [], 6: []}
+        for network in networks:
+            self.add(network)
+
+    def __bool__(self) -> bool:
+        return bool(self._terminals)
+
+    def __contains__(self, network: IPNetwork) -> bool:
+        return _trie_key(network, network.prefixlen) in self._terminals
+
+    def __len__(self) -> int:
+        return len(self._terminals)
+
+    def add(self, network: IPNetwork) -> None:
+        for depth in range(network.prefixlen + 1):
+            self._nodes.add(_trie_key(network, depth))
+        self._terminals[_trie_key(network, network.prefixlen)] = network
+        if network.prefixlen not in self._terminal_lens[network.version]:
+            insort(self._terminal_lens[network.version], network.prefixlen)
+
+    def longest_match(self, network: IPNetwork) -> Optional[IPNetwork]:
+        """Return the most specific stored network containing network"""
+        match = None
+        for depth in self._terminal_lens[network.version]:
+            if depth > network.prefixlen:
+                break
+            match = self._terminals.get(_trie_key(network, depth), match)
+        return match
+
+    def overlaps(self, network: IPNetwork) -> bool:
+        """Is network a subnet or supernet of any stored network"""
+        # Nodes only exist on the path to a stored network, so reaching the
+        # node for network means a stored network is at or below it
+        if _trie_key(network, network.prefixlen) in self._nodes:
+            return True
+        return self.longest_match(network) is not None
+
+
+def _trie_key(network: IPNetwork, depth: int) -> Tuple[int, int, int]:
+    return (
+        network.version,
+        depth,
+        int(network.network_address) >> (network.max_prefixlen - depth),
+    )
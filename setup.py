@@ -41,6 +41,7 @@ setup(
     entry_points={
         "console_scripts": ["aioexabgp-announcer = aioexabgp.announcer.main:main"]
     },
+    extras_require={"fast": ["icmplib", "orjson", "uvloop"], "netlink": ["pyroute2"]},
     python_requires=">=3.8",
     test_suite=ptr_params["test_suite"],
 )
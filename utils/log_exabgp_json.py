@@ -1,18 +1,187 @@
 #!/usr/bin/env python3
 
+import argparse
 import json
 from datetime import datetime
+from os import read
+from select import select
+from signal import SIGHUP, signal
 from sys import stdin
+from time import time_ns
+from types import FrameType
+from typing import Any, BinaryIO, Iterator, List, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore
 
 
 LOG_FILE = "/tmp/exabgp_json"
+# json.dumps() builds a new encoder every call when passed options
+JSON_DECODER = json.JSONDecoder()
+JSON_ENCODER = json.JSONEncoder(indent=2, ensure_ascii=False)
+JSON_START_BYTES = b"{["
+READ_SIZE = 64 * 1024
+# Write out logged records once we have this many bytes or stdin goes idle
+WRITE_BATCH_SIZE = 64 * 1024
+
+
+class LogFile:
+    """Unbuffered log file - we batch writes ourselves so skip the extra copy.
+    With rotate we append and reopen the file on SIGHUP so external log
+    rotation can rename it away rather than copy + truncate"""
+
+    def __init__(self, path: str, rotate: bool = False) -> None:
+        self.path = path
+        self.rotate = rotate
+        self.reopen = False
+        self.fp: BinaryIO = open(path, "ab" if rotate else "wb", buffering=0)
+        if rotate:
+            signal(SIGHUP, self.hup)
+
+    def __enter__(self) -> "LogFile":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.fp.close()
+
+    def hup(self, signum: int, frame: Optional[FrameType]) -> None:
+        # Reopen on the next write so we never swap files mid write
+        self.reopen = True
+
+    def write(self, data: Union[bytes, bytearray]) -> None:
+        if self.reopen:
+            self.reopen = False
+            self.fp.close()
+            self.fp = open(self.path, "ab", buffering=0)
+        # Unbuffered write() can be partial - Loop so no part of a batch is lost
+        remaining = memoryview(data)
+        while remaining:
+            remaining = remaining[self.fp.write(remaining) :]
+
+
+def format_json(line: bytes) -> bytes:
+    if orjson:
+        return orjson.dumps(orjson.loads(line), option=orjson.OPT_INDENT_2)
+    return JSON_ENCODER.encode(JSON_DECODER.decode(line.decode())).encode()
+
+
+class Timestamper:
+    """Only ISO format the time once per second - records just add the usecs"""
+
+    def __init__(self) -> None:
+        self.second = -1
+        self.prefix = b""
+
+    def now(self) -> bytes:
+        second, ns = divmod(time_ns(), 1_000_000_000)
+        if second != self.second:
+            self.second = second
+            self.prefix = datetime.fromtimestamp(second).isoformat().encode()
+        return b"%s.%06d" % (self.prefix, ns // 1000)
+
 
+def valid_json(line: bytes) -> bool:
+    try:
+        if orjson:
+            orjson.loads(line)
+        else:
+            JSON_DECODER.decode(line.decode())
+    except ValueError:
+        return False
+    return True
 
-with open(LOG_FILE, "w") as log_fp:
-    print("Starting the exabgp logger", file=log_fp, flush=True)
+
+def invalid_record(timestamp: bytes, line: bytes) -> bytes:
+    return b"%s: Invalid JSON line: %s\n" % (timestamp, line)
+
+
+def format_record(
+    timestamp: bytes, line: bytes, pretty: bool, validate: bool = False
+) -> bytes:
+    # Cheap check so we don't run the JSON parser on what can't be JSON
+    if line[0] not in JSON_START_BYTES:
+        return b"%s: Skipping non JSON line: %s\n" % (timestamp, line)
+    if pretty:
+        try:
+            return b"%s:\n%s\n\n" % (timestamp, format_json(line))
+        except ValueError:
+            return invalid_record(timestamp, line)
+    if validate and not valid_json(line):
+        return invalid_record(timestamp, line)
+    # exabgp already sends compact JSON - no need to decode + re-encode it
+    return b"%s: %s\n" % (timestamp, line)
+
+
+def stdin_lines() -> Iterator[List[bytes]]:
+    """Read stdin in chunks and yield each chunk's complete lines - one read()
+    and one split in C rather than a line at a time"""
+    pending = b""
     while True:
-        line = stdin.readline().strip()
-        formatted_json = json.dumps(json.loads(line), indent=2)
-        print(f"{datetime.now().isoformat()}:", file=log_fp, flush=True)
-        print(formatted_json, file=log_fp, flush=True)
-        print("", file=log_fp, flush=True)
+        chunk = read(stdin.fileno(), READ_SIZE)
+        if not chunk:
+            break
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        yield lines
+
+    # A last line without a trailing newline
+    if pending:
+        yield [pending]
+
+
+def stdin_idle() -> bool:
+    readable, _, _ = select([stdin], [], [], 0)
+    return not readable
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Log exabgp API JSON to a file")
+    parser.add_argument(
+        "--pretty",
+        action="store_true",
+        help="Pretty print each JSON record rather than logging it as one line",
+    )
+    parser.add_argument(
+        "--validate",
+        action="store_true",
+        help="Check each line parses as JSON but still log the original bytes",
+    )
+    parser.add_argument(
+        "--rotate",
+        action="store_true",
+        help="Append to the log and reopen it on SIGHUP (for external rotation)",
+    )
+    args = parser.parse_args()
+
+    with LogFile(LOG_FILE, args.rotate) as log_fp:
+        log_fp.write(b"Starting the exabgp logger\n")
+        # Batch records so a burst of updates (e.g. at convergence) costs one
+        # write per WRITE_BATCH_SIZE rather than one per record
+        batch = bytearray()
+        timestamper = Timestamper()
+        try:
+            # Read stdin as bytes - skips text mode's per line utf-8 decode
+            for lines in stdin_lines():
+                for line in lines:
+                    line = line.strip()
+                    # Blank lines have nothing to log
+                    if line:
+                        batch += format_record(
+                            timestamper.now(), line, args.pretty, args.validate
+                        )
+
+                if len(batch) >= WRITE_BATCH_SIZE or stdin_idle():
+                    log_fp.write(batch)
+                    batch.clear()
+        finally:
+            # Don't lose what we have buffered if we're exiting
+            log_fp.write(batch)
+
+    # EOF - exabgp has gone away
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())  # pragma: no cover